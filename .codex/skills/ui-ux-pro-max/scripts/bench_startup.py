@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark for search.py - runs each CLI mode under `python -X importtime`
+and checks total import time against a recorded per-mode budget.
+
+Usage:
+    python bench_startup.py            # all modes, median of 5 runs
+    python bench_startup.py -r 10 domain stack
+    python bench_startup.py --top 8    # also list the slowest top-level imports
+
+Exits with status 1 when a mode is over budget or imports a module its path
+should not need (e.g. design_system for a plain domain search).
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SEARCH_SCRIPT = Path(__file__).parent / "search.py"
+
+# mode: (search.py arguments, stdin, import budget in ms)
+# Budgets are roughly 2x the medians measured with CPython 3.11 on a Linux runner
+# (plain domain search ~28 ms, design system ~31 ms) to absorb noisy CI hosts.
+STARTUP_BUDGETS = {
+    "domain": (["glassmorphism", "-d", "color"], None, 55),
+    "auto-domain": (["glassmorphism dark mode"], None, 55),
+    "stack": (["state management", "-s", "swiftui"], None, 55),
+    "json": (["glassmorphism", "-d", "color", "--json"], None, 60),
+    "ndjson": (["--ndjson"], '"glassmorphism"\n{"query": "state", "stack": "swiftui"}\n', 60),
+    "design-system": (["SaaS dashboard", "--design-system"], None, 70)
+}
+
+# Modules each mode must not import (lazy-import regressions)
+FORBIDDEN_IMPORTS = {
+    "domain": ["design_system", "datetime", "json", "socket", "tempfile"],
+    "auto-domain": ["design_system", "datetime", "json", "socket", "tempfile"],
+    "stack": ["design_system", "datetime", "json", "socket", "tempfile"],
+    "json": ["design_system", "datetime", "socket", "tempfile"],
+    "ndjson": ["design_system", "datetime", "socket", "tempfile"]
+}
+
+
+def parse_importtime(stderr):
+    """Return ({module: cumulative_us} for top-level imports, set of all imported modules)"""
+    top_level = {}
+    imported = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        module = name.strip()
+        imported.add(module)
+        # Nested imports are indented two spaces per level after the separator
+        if not name[1:].startswith(" "):
+            top_level[module] = int(cumulative_us)
+    return top_level, imported
+
+
+def run_mode(args, stdin):
+    """Run search.py once, returning (import_ms, wall_ms, top-level imports, imported modules)"""
+    env = dict(os.environ)
+    # Measure with bytecode caching, as on a normal install
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    command = [sys.executable, "-X", "importtime", str(SEARCH_SCRIPT)] + args + ["--no-daemon"]
+    start = time.perf_counter()
+    proc = subprocess.run(command, input=stdin or "", capture_output=True, text=True, encoding="utf-8", env=env)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{proc.stderr[-2000:]}")
+    top_level, imported = parse_importtime(proc.stderr)
+    return sum(top_level.values()) / 1000, wall_ms, top_level, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search.py startup benchmark")
+    parser.add_argument("modes", nargs="*", help=f"Modes to run (default: all of {', '.join(STARTUP_BUDGETS)})")
+    parser.add_argument("--runs", "-r", type=int, default=5, help="Runs per mode (median is reported)")
+    parser.add_argument("--top", type=int, default=0, help="Show the N slowest top-level imports per mode")
+    args = parser.parse_args()
+    unknown = [mode for mode in args.modes if mode not in STARTUP_BUDGETS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    failed = False
+    print(f"{'mode':<15} {'import ms':>10} {'budget':>8} {'wall ms':>9}  status")
+    for mode in args.modes or list(STARTUP_BUDGETS):
+        cli_args, stdin, budget = STARTUP_BUDGETS[mode]
+        run_mode(cli_args, stdin)  # warm bytecode and index caches
+        samples = [run_mode(cli_args, stdin) for _ in range(args.runs)]
+        import_ms = statistics.median(s[0] for s in samples)
+        wall_ms = statistics.median(s[1] for s in samples)
+        forbidden = sorted(m for m in FORBIDDEN_IMPORTS.get(mode, []) if m in samples[-1][3])
+
+        status = "ok"
+        if import_ms > budget:
+            status = "OVER BUDGET"
+        if forbidden:
+            status = f"imports {', '.join(forbidden)}"
+        failed = failed or status != "ok"
+        print(f"{mode:<15} {import_ms:>10.1f} {budget:>8} {wall_ms:>9.1f}  {status}")
+
+        if args.top:
+            for module, cumulative_us in sorted(samples[-1][2].items(), key=lambda x: -x[1])[:args.top]:
+                print(f"    {cumulative_us / 1000:>8.1f} ms  {module}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consistency checks for the search engine - paths that must give identical
+results are compared over queries drawn from the bundled data.
+
+Usage:
+    python check_search.py               # all checks
+    python check_search.py routing
+
+Checks:
+    routing    search(query) equals search(query, <routed domain>)
+    sharded    a 4-shard ShardedCorpus ranks each domain like its single index
+    top_k      BM25.top_k (MaxScore) equals the head of a full BM25.score
+    numpy      the numpy backend ranks like the python one (skipped without NumPy)
+    sync       indexes updated in place after CSV edits rank like fresh rebuilds
+    cache      after a CSV edit, cached searches answer like a fresh process
+    reasoning  ReasoningIndex.find picks the rule the linear table scans pick
+    ndjson     invalid NDJSON lines get an error with their id; valid lines still answer
+    server     malformed JSON-RPC requests get the matching error replies
+
+The sync and cache checks edit a scratch copy of the data directory; the
+bundled files and the compiled index cache are left alone.
+
+Exits with status 1 when any check finds a mismatch.
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import shutil
+import socket
+import sys
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+
+import core
+from core import (AVAILABLE_STACKS, CSV_CONFIG, DATA_DIR, MAX_RESULTS, ROW_KEY, _iter_csv, _load_numpy, registry,
+                  search, sharded_corpus)
+
+# Queries that exercise the query planner: common terms dropped, repeats, typos
+EXTRA_QUERIES = [
+    "the design of a modern app",
+    "design design design system",
+    "modern clean minimal design for a saas dashboard",
+    "glasmorphism dark mode",
+    "accesibility keyboard navigation",
+    "animation",
+    "button focus keyboard",
+    "validaton errors form"
+]
+
+# Indexes the sync check edits: two domains and a stack
+SYNC_TARGETS = [("domain", "ux"), ("domain", "style"), ("stack", AVAILABLE_STACKS[0])]
+
+# A word no data file contains, added by the cache check; its misspelling
+# only matches once the edit is seen (through fuzzy expansion)
+NEW_WORD = "zephyrglass"
+
+
+def sample_queries(step=7):
+    """Every step-th row's first two search columns of each domain, plus EXTRA_QUERIES"""
+    queries = list(EXTRA_QUERIES)
+    for config in CSV_CONFIG.values():
+        filepath = DATA_DIR / config["file"]
+        if not filepath.exists():
+            continue
+        for pos, row in enumerate(_iter_csv(filepath)):
+            if pos % step == 0:
+                queries.append(" ".join(str(row.get(col, "")) for col in config["search_cols"][:2]))
+    return queries
+
+
+@contextmanager
+def scratch_data():
+    """Point core at a copy of the data directory (with the index cache off) while the block runs"""
+    saved = core.DATA_DIR, core.CACHE_ENABLED, core.registry
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DATA_DIR = Path(tmp) / "data"
+        shutil.copytree(saved[0], core.DATA_DIR)
+        core.CACHE_ENABLED = False
+        try:
+            yield core.DATA_DIR
+        finally:
+            core.DATA_DIR, core.CACHE_ENABLED, core.registry = saved
+
+
+def edit_csv(path, rng, words, extra_rows=()):
+    """Rewrite a data file with a few cells changed, rows removed and rows appended"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames
+        rows = list(reader)
+    for _ in range(5):
+        rows[rng.randrange(len(rows))][rng.choice(columns[1:])] = " ".join(rng.choices(words, k=8))
+    for _ in range(3):
+        rows.pop(rng.randrange(len(rows)))
+    next_key = max(int(row[ROW_KEY]) for row in rows) + 1
+    for pos, text in enumerate([" ".join(rng.choices(words, k=10)) for _ in range(3)] + list(extra_rows)):
+        row = dict(rng.choice(rows), **{ROW_KEY: str(next_key + pos), columns[1]: text})
+        rows.append(row)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def check_routing(queries):
+    """Queries whose routed results differ from searching the routed domain directly"""
+    mismatches = []
+    for query in queries:
+        routed = search(query)
+        direct = search(query, routed["domain"])
+        if routed["results"] != direct["results"]:
+            mismatches.append(f"{query!r} routed to {routed['domain']}")
+    return mismatches
+
+
+def check_sharded(queries, shards=4, k=5):
+    """Queries whose sharded top k differs from the single index, per domain"""
+    mismatches = []
+    for domain, config in CSV_CONFIG.items():
+        if not (DATA_DIR / config["file"]).exists():
+            continue
+        bm25 = registry.get(domain).bm25
+        with sharded_corpus(domain, shards=shards) as corpus:
+            sharded = corpus.top_k_batch(queries, k)
+        for query, hits in zip(queries, sharded):
+            if hits != bm25.top_k(query, k):
+                mismatches.append(f"{domain}: {query!r}")
+    return mismatches
+
+
+def check_top_k(queries, k=5):
+    """Queries whose MaxScore top k differs from the best k of a full score, per domain"""
+    mismatches = []
+    for domain, config in CSV_CONFIG.items():
+        if not (DATA_DIR / config["file"]).exists():
+            continue
+        bm25 = registry.get(domain).bm25
+        for query in queries:
+            full = [(idx, score) for idx, score in bm25.score(query) if score > 0][:k]
+            if bm25.top_k(query, k, "python") != full:
+                mismatches.append(f"{domain}: {query!r}")
+    return mismatches
+
+
+def check_numpy(queries, k=5):
+    """Queries whose numpy top k (single and batched) differs from the python one; None without NumPy"""
+    if _load_numpy() is None:
+        return None
+
+    def same(hits, expected):
+        return ([idx for idx, _ in hits] == [idx for idx, _ in expected]
+                and all(math.isclose(a, b, rel_tol=1e-9) for (_, a), (_, b) in zip(hits, expected)))
+
+    mismatches = []
+    for domain, config in CSV_CONFIG.items():
+        if not (DATA_DIR / config["file"]).exists():
+            continue
+        bm25 = registry.get(domain).bm25
+        batch = bm25.top_k_batch(queries, k, "numpy")
+        for query, batched in zip(queries, batch):
+            expected = bm25.top_k(query, k, "python")
+            if not same(bm25.top_k(query, k, "numpy"), expected) or not same(batched, expected):
+                mismatches.append(f"{domain}: {query!r}")
+    return mismatches
+
+
+def check_sync(queries, rounds=3, k=5):
+    """Queries an in-place synced index ranks differently from a rebuild of the edited file"""
+    mismatches = []
+    rng = random.Random(0)
+    with scratch_data():
+        synced_registry = core.CorpusRegistry(auto_refresh=True)
+        for key in SYNC_TARGETS:
+            synced_registry._get(key)
+        words = core.BM25.tokenize(" ".join(queries))
+        for round_no in range(rounds):
+            for key in SYNC_TARGETS:
+                edit_csv(synced_registry._spec(key)[0], rng, words)
+            for key in SYNC_TARGETS:
+                synced = synced_registry._get(key)
+                bm25, rows = core._build_index(*synced_registry._spec(key))
+                for query in queries:
+                    for backend in core.BACKENDS:
+                        got = [(synced.rows.keys[idx], score) for idx, score in synced.bm25.top_k(query, k, backend)]
+                        expected = [(rows.keys[idx], score) for idx, score in bm25.top_k(query, k, backend)]
+                        if got != expected:
+                            mismatches.append(f"round {round_no} {key[1]} ({backend}): {query!r}")
+    return mismatches
+
+
+def check_cache(queries, domain="style", k=3):
+    """Queries whose cached answer after a CSV edit differs from a fresh process"""
+    queries = list(queries) + [NEW_WORD[:-1]]
+    with scratch_data() as data_dir:
+        core.registry = core.CorpusRegistry(auto_refresh=True)
+        before = [search(query, domain, k) for query in queries]
+        words = core.BM25.tokenize(" ".join(queries))
+        edit_csv(data_dir / CSV_CONFIG[domain]["file"], random.Random(1), words, [f"{NEW_WORD} layout"])
+        after = [search(query, domain, k)["results"] for query in queries]
+
+        core.registry = core.CorpusRegistry()
+        core.result_cache.clear()
+        fresh = [search(query, domain, k)["results"] for query in queries]
+
+    mismatches = [f"{query!r}" for query, got, expected in zip(queries, after, fresh) if got != expected]
+    if before[-1]["results"] or not after[-1]:
+        mismatches.append(f"{NEW_WORD[:-1]!r} did not pick up the added row")
+    return mismatches
+
+
+def _scan_reasoning(rules, category):
+    """Index of the reasoning rule the original three linear scans pick, or None"""
+    category_lower = category.lower()
+    names = [(rule.get("UI_Category") or "").lower() for rule in rules]
+    for idx, name in enumerate(names):
+        if name == category_lower:
+            return idx
+    for idx, name in enumerate(names):
+        if name in category_lower or category_lower in name:
+            return idx
+    for idx, name in enumerate(names):
+        if any(keyword in category_lower for keyword in name.replace("/", " ").replace("-", " ").split()):
+            return idx
+    return None
+
+
+def check_reasoning(queries):
+    """Categories (rule names, their fragments, product types, queries) resolved differently"""
+    from design_system import REASONING_FILE, ReasoningIndex
+
+    rules = registry.table(REASONING_FILE)
+    categories = ["", "xyzzy"] + list(queries)
+    for rule in rules:
+        name = rule.get("UI_Category") or ""
+        categories += [name, name.upper(), name[:5], name[2:], name.split(" ")[0], f"modern {name} app"]
+    if (DATA_DIR / CSV_CONFIG["product"]["file"]).exists():
+        categories += [row.get("Product Type", "") for row in _iter_csv(DATA_DIR / CSV_CONFIG["product"]["file"])]
+
+    index = ReasoningIndex(rules)
+    return [f"{category!r}" for category in dict.fromkeys(categories)
+            if index.find(category) != _scan_reasoning(rules, category)]
+
+
+def check_ndjson(queries):
+    """NDJSON lines answered wrongly: invalid lines need an error (with their id), valid ones a result"""
+    import search as cli
+
+    valid = [json.dumps(queries[0]), json.dumps({"id": "q", "query": queries[1], "domain": "color"})]
+    invalid = [
+        "{not json",
+        json.dumps([queries[0]]),
+        json.dumps({"id": 1, "query": 5}),
+        json.dumps({"id": 2, "query": "x", "max_results": "2"}),
+        json.dumps({"id": 3, "query": "x", "max_results": -1}),
+        json.dumps({"id": 4, "query": "x", "max_results": True}),
+        json.dumps({"id": 5, "query": "x", "domain": "nope"}),
+        json.dumps({"id": 6, "query": "x", "stack": "nope"}),
+        json.dumps({"id": 7, "query": "x", "stack": ["react"]})
+    ]
+    lines = invalid[:4] + valid[:1] + invalid[4:] + valid[1:]
+    args = argparse.Namespace(domain=None, stack=None, max_results=MAX_RESULTS, backend=None)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        cli.run_ndjson(io.StringIO("\n".join(lines) + "\n"), args)
+    replies = [json.loads(line) for line in output.getvalue().splitlines()]
+    if len(replies) != len(lines):
+        return [f"{len(lines)} lines answered with {len(replies)} replies"]
+
+    mismatches = []
+    for line, reply in zip(lines, replies):
+        request = json.loads(line) if line in valid else None
+        if line in valid:
+            if isinstance(request, str):
+                request = {"query": request}
+            expected = search(request["query"], request.get("domain"))
+            expected.update({"id": request["id"]} if "id" in request else {})
+            if reply != expected:
+                mismatches.append(f"valid line {line} answered {reply}")
+        elif "error" not in reply:
+            mismatches.append(f"invalid line {line} answered without an error")
+        elif line.startswith("{\"id\"") and reply.get("id") != json.loads(line)["id"]:
+            mismatches.append(f"invalid line {line} lost its id")
+    return mismatches
+
+
+def check_server(queries):
+    """JSON-RPC lines whose reply has the wrong error code, id or result"""
+    import server
+
+    cases = [
+        ("{not json", None, server.PARSE_ERROR),
+        ("[1, 2]", None, server.INVALID_REQUEST),
+        (json.dumps({"jsonrpc": "2.0", "id": 1}), 1, server.INVALID_REQUEST),
+        (json.dumps({"jsonrpc": "2.0", "id": 2, "method": "nope"}), 2, server.METHOD_NOT_FOUND),
+        (json.dumps({"jsonrpc": "2.0", "id": 3, "method": "search", "params": {"nope": 1}}), 3, server.INVALID_PARAMS),
+        (json.dumps({"jsonrpc": "2.0", "id": 4, "method": "ping", "params": [1]}), 4, server.INVALID_PARAMS),
+        (json.dumps({"jsonrpc": "2.0", "id": 5, "method": "search",
+                     "params": {"query": queries[0], "max_results": "two"}}), 5, server.INTERNAL_ERROR)
+    ]
+    mismatches = []
+    for line, request_id, code in cases:
+        reply = json.loads(server.handle_line(line))
+        if reply.get("id") != request_id or reply.get("error", {}).get("code") != code:
+            mismatches.append(f"{line} answered {reply}")
+
+    reply = json.loads(server.handle_line(json.dumps({"jsonrpc": "2.0", "id": 6, "method": "search",
+                                                      "params": {"query": queries[0]}})))
+    if reply.get("result") != search(queries[0]):
+        mismatches.append(f"a valid search answered {reply}")
+    if server.handle_line(json.dumps({"jsonrpc": "2.0", "method": "nope"})) is not None:
+        mismatches.append("a notification was answered")
+
+    # call() only connects to a socket the current user owns
+    if hasattr(socket, "AF_UNIX"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "check.sock")
+            Path(path + ".txt").touch()
+            if server._is_own_socket(path + ".txt"):
+                mismatches.append("a plain file was taken for the daemon socket")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.bind(path)
+                if not server._is_own_socket(path):
+                    mismatches.append("the user's own socket was not accepted")
+    return mismatches
+
+
+CHECKS = {
+    "routing": check_routing,
+    "sharded": check_sharded,
+    "top_k": check_top_k,
+    "numpy": check_numpy,
+    "sync": check_sync,
+    "cache": check_cache,
+    "reasoning": check_reasoning,
+    "ndjson": check_ndjson,
+    "server": check_server
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search engine consistency checks")
+    parser.add_argument("checks", nargs="*", help=f"Checks to run (default: all of {', '.join(CHECKS)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+
+    queries = sample_queries()
+    print(f"{len(queries)} sample queries")
+    failed = False
+    for name in args.checks or list(CHECKS):
+        mismatches = CHECKS[name](queries)
+        if mismatches is None:
+            print(f"{name:<10} skipped")
+            continue
+        failed = failed or bool(mismatches)
+        print(f"{name:<10} {len(mismatches)} mismatches")
+        for mismatch in mismatches[:10]:
+            print(f"    {mismatch}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
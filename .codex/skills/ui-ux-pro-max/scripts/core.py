@@ -4,66 +4,100 @@
 UI/UX Pro Max Core - BM25 search engine for UI/UX style guides
 """
 
-import csv
+import heapq
+import os
 import re
+import sys
+from array import array
 from pathlib import Path
+from bisect import bisect_left
 from math import log
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+
+import tokenizer
+from tokenizer import tokenize_query
 
 # ============ CONFIGURATION ============
 DATA_DIR = Path(__file__).parent.parent / "data"
 MAX_RESULTS = 3
 
+# Compiled indexes are cached here, one file per data CSV (set UI_PRO_MAX_NO_CACHE=1 to disable)
+CACHE_DIR = Path(os.environ.get("UI_PRO_MAX_CACHE_DIR") or Path.home() / ".cache" / "ui-ux-pro-max")
+CACHE_ENABLED = not os.environ.get("UI_PRO_MAX_NO_CACHE")
+INDEX_CACHE_VERSION = 7
+
+# Column that identifies a row across edits of a data file (used to update
+# indexes in place when a file changes under a long-running process)
+ROW_KEY = "No"
+
+# Search result LRU: entries kept in memory, plus optional on-disk persistence
+# shared across CLI invocations (UI_PRO_MAX_PERSIST_RESULTS=1)
+RESULT_CACHE_SIZE = int(os.environ.get("UI_PRO_MAX_RESULT_CACHE_SIZE") or 1024)
+RESULT_CACHE_PERSIST = CACHE_ENABLED and bool(os.environ.get("UI_PRO_MAX_PERSIST_RESULTS"))
+
+# search_cols are scored as separate fields (BM25F); field_weights multiplies a
+# column's term frequencies and length, so names and curated keywords outrank
+# incidental mentions in long descriptions. Unlisted columns weigh 1.
 CSV_CONFIG = {
     "style": {
         "file": "styles.csv",
         "search_cols": ["Style Category", "Keywords", "Best For", "Type", "AI Prompt Keywords"],
-        "output_cols": ["Style Category", "Type", "Keywords", "Primary Colors", "Effects & Animation", "Best For", "Performance", "Accessibility", "Framework Compatibility", "Complexity", "AI Prompt Keywords", "CSS/Technical Keywords", "Implementation Checklist", "Design System Variables"]
+        "output_cols": ["Style Category", "Type", "Keywords", "Primary Colors", "Effects & Animation", "Best For", "Performance", "Accessibility", "Framework Compatibility", "Complexity", "AI Prompt Keywords", "CSS/Technical Keywords", "Implementation Checklist", "Design System Variables"],
+        "field_weights": {"Style Category": 4, "Keywords": 2}
     },
     "color": {
         "file": "colors.csv",
         "search_cols": ["Product Type", "Notes"],
-        "output_cols": ["Product Type", "Primary (Hex)", "Secondary (Hex)", "CTA (Hex)", "Background (Hex)", "Text (Hex)", "Notes"]
+        "output_cols": ["Product Type", "Primary (Hex)", "Secondary (Hex)", "CTA (Hex)", "Background (Hex)", "Text (Hex)", "Notes"],
+        "field_weights": {"Product Type": 2}
     },
     "chart": {
         "file": "charts.csv",
         "search_cols": ["Data Type", "Keywords", "Best Chart Type", "Accessibility Notes"],
-        "output_cols": ["Data Type", "Keywords", "Best Chart Type", "Secondary Options", "Color Guidance", "Accessibility Notes", "Library Recommendation", "Interactive Level"]
+        "output_cols": ["Data Type", "Keywords", "Best Chart Type", "Secondary Options", "Color Guidance", "Accessibility Notes", "Library Recommendation", "Interactive Level"],
+        "field_weights": {"Data Type": 2, "Keywords": 2}
     },
     "landing": {
         "file": "landing.csv",
         "search_cols": ["Pattern Name", "Keywords", "Conversion Optimization", "Section Order"],
-        "output_cols": ["Pattern Name", "Keywords", "Section Order", "Primary CTA Placement", "Color Strategy", "Conversion Optimization"]
+        "output_cols": ["Pattern Name", "Keywords", "Section Order", "Primary CTA Placement", "Color Strategy", "Conversion Optimization"],
+        "field_weights": {"Pattern Name": 2, "Keywords": 2}
     },
     "product": {
         "file": "products.csv",
         "search_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Key Considerations"],
-        "output_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Secondary Styles", "Landing Page Pattern", "Dashboard Style (if applicable)", "Color Palette Focus"]
+        "output_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Secondary Styles", "Landing Page Pattern", "Dashboard Style (if applicable)", "Color Palette Focus"],
+        "field_weights": {"Product Type": 2, "Keywords": 2}
     },
     "ux": {
         "file": "ux-guidelines.csv",
         "search_cols": ["Category", "Issue", "Description", "Platform"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"],
+        "field_weights": {"Issue": 2}
     },
     "typography": {
         "file": "typography.csv",
         "search_cols": ["Font Pairing Name", "Category", "Mood/Style Keywords", "Best For", "Heading Font", "Body Font"],
-        "output_cols": ["Font Pairing Name", "Category", "Heading Font", "Body Font", "Mood/Style Keywords", "Best For", "Google Fonts URL", "CSS Import", "Tailwind Config", "Notes"]
+        "output_cols": ["Font Pairing Name", "Category", "Heading Font", "Body Font", "Mood/Style Keywords", "Best For", "Google Fonts URL", "CSS Import", "Tailwind Config", "Notes"],
+        "field_weights": {"Font Pairing Name": 2, "Mood/Style Keywords": 2}
     },
     "icons": {
         "file": "icons.csv",
         "search_cols": ["Category", "Icon Name", "Keywords", "Best For"],
-        "output_cols": ["Category", "Icon Name", "Keywords", "Library", "Import Code", "Usage", "Best For", "Style"]
+        "output_cols": ["Category", "Icon Name", "Keywords", "Library", "Import Code", "Usage", "Best For", "Style"],
+        "field_weights": {"Icon Name": 2, "Keywords": 2}
     },
     "react": {
         "file": "react-performance.csv",
         "search_cols": ["Category", "Issue", "Keywords", "Description"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"],
+        "field_weights": {"Issue": 2, "Keywords": 2}
     },
     "web": {
         "file": "web-interface.csv",
         "search_cols": ["Category", "Issue", "Keywords", "Description"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"],
+        "field_weights": {"Issue": 2, "Keywords": 2}
     }
 }
 
@@ -86,153 +120,1819 @@ STACK_CONFIG = {
 # Common columns for all stacks
 _STACK_COLS = {
     "search_cols": ["Category", "Guideline", "Description", "Do", "Don't"],
-    "output_cols": ["Category", "Guideline", "Description", "Do", "Don't", "Code Good", "Code Bad", "Severity", "Docs URL"]
+    "output_cols": ["Category", "Guideline", "Description", "Do", "Don't", "Code Good", "Code Bad", "Severity", "Docs URL"],
+    "field_weights": {"Guideline": 2}
 }
 
 AVAILABLE_STACKS = list(STACK_CONFIG.keys())
 
+# Scoring backend: "python" (default) or "numpy" (falls back to python when NumPy is missing)
+BACKENDS = ["python", "numpy"]
+BM25_BACKEND = os.environ.get("UI_PRO_MAX_BM25_BACKEND", "python")
+
+# Query planning (BM25.plan): repeated tokens become one weighted term; terms
+# whose idf is under QUERY_MIN_IDF (in ~80%+ of rows) are dropped, and only
+# the QUERY_MAX_TERMS terms with the largest score bounds are kept
+QUERY_MIN_IDF = 0.2
+QUERY_MAX_TERMS = 32
+
+# Fuzzy matching: a query token of FUZZY_MIN_LENGTH+ characters that the
+# index lacks is replaced by the closest indexed terms (up to
+# FUZZY_MAX_EXPANSIONS, within 1 edit, or 2 for tokens of FUZZY_LONG_TOKEN+
+# characters), weighted by similarity. Shorter tokens are too often real
+# words a domain lacks ("chart" is one edit from "chat"). UI_PRO_MAX_NO_FUZZY=1 disables it.
+FUZZY_ENABLED = not os.environ.get("UI_PRO_MAX_NO_FUZZY")
+FUZZY_MIN_LENGTH = 6
+FUZZY_LONG_TOKEN = 9
+FUZZY_MAX_EXPANSIONS = 3
+
+
+# ============ OPTIONAL NUMPY BACKEND ============
+_numpy_modules = None
+
+
+def _load_numpy():
+    """Import NumPy (and scipy.sparse when present) on first use; None if NumPy is missing"""
+    global _numpy_modules
+    if _numpy_modules is None:
+        try:
+            import numpy
+        except ImportError:
+            _numpy_modules = False
+        else:
+            try:
+                from scipy import sparse
+            except ImportError:
+                sparse = None
+            _numpy_modules = (numpy, sparse)
+    return _numpy_modules or None
+
+
+def set_backend(backend):
+    """Select the scoring backend used when a call does not pass one"""
+    global BM25_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Available: {', '.join(BACKENDS)}")
+    BM25_BACKEND = backend
+
+
+def _resolve_backend(backend):
+    """Backend to actually use for a call"""
+    backend = backend or BM25_BACKEND
+    if backend == "numpy" and _load_numpy():
+        return "numpy"
+    return "python"
+
+
+# ============ FUZZY MATCHING ============
+def _edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TermIndex:
+    """Character trigram index over a vocabulary, for typo-tolerant term lookup
+
+    Each term is indexed under the trigrams of "^term$". A candidate must
+    share enough trigrams with the token to be within the edit limit
+    (q-gram lemma) before its edit distance is computed, so a lookup reads
+    only the short trigram lists of the token instead of the vocabulary.
+    Candidates must also share the token's first letter, so terms are
+    grouped by it and a group's trigrams are indexed on its first lookup.
+    """
+
+    MEMO_SIZE = 4096
+
+    def __init__(self, terms):
+        self.initials = defaultdict(list)
+        for term in terms:
+            self.initials[term[0]].append(term)
+        self._grams = {}
+        self._memo = {}
+
+    @staticmethod
+    def _trigrams(term):
+        padded = f"^{term}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def _grams_for(self, initial):
+        """{trigram: terms} of the terms starting with initial, built on first use"""
+        grams = self._grams.get(initial)
+        if grams is None:
+            grams = self._grams[initial] = defaultdict(list)
+            for term in self.initials.get(initial, ()):
+                for gram in self._trigrams(term):
+                    grams[gram].append(term)
+        return grams
+
+    def expand(self, token):
+        """[(term, similarity)] of the closest terms, best first; similarity is 1 - edits / length"""
+        expansions = self._memo.get(token)
+        if expansions is not None:
+            return expansions
+        expansions = []
+        if len(token) >= FUZZY_MIN_LENGTH:
+            limit = 2 if len(token) >= FUZZY_LONG_TOKEN else 1
+            grams = self._trigrams(token)
+            index = self._grams_for(token[0])
+            shared = defaultdict(int)
+            for gram in grams:
+                for term in index.get(gram, ()):
+                    shared[term] += 1
+            # One edit changes at most 3 trigrams
+            needed = len(grams) - 3 * limit
+            scored = []
+            for term, count in shared.items():
+                # Typos rarely hit the first letter; requiring it keeps "gaming" from matching "naming"
+                if count >= needed and abs(len(term) - len(token)) <= limit:
+                    distance = _edit_distance(token, term, limit)
+                    if 0 < distance <= limit:
+                        scored.append((distance, term))
+            scored.sort()
+            expansions = [(term, 1 - distance / max(len(token), len(term)))
+                          for distance, term in scored[:FUZZY_MAX_EXPANSIONS]]
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[token] = expansions
+        return expansions
+
+
+# ============ QUERY PLANNING ============
+def plan_query(query, idf, max_impacts, expand):
+    """Terms to score for a query: ([(term, weight)], [(term, reason)] dropped)
+
+    idf and max_impacts hold every indexed term of the collection and
+    expand(token) its fuzzy matches; a sharded collection plans with its
+    combined statistics, so each shard scores exactly the single-index plan.
+
+    Repeated tokens are merged into one term weighted by its count, so
+    each term's postings are read once. A token the collection lacks is
+    replaced by its fuzzy expansions (weight scaled by similarity) or
+    dropped. Terms with idf under QUERY_MIN_IDF are dropped too, unless
+    that would leave nothing to score. Beyond QUERY_MAX_TERMS, the terms
+    with the smallest score bounds go. Kept terms stay in query order.
+    """
+    counts = {}
+    for token in tokenize_query(query):
+        counts[token] = counts.get(token, 0) + 1
+
+    dropped = []
+    if FUZZY_ENABLED and any(token not in idf for token in counts):
+        weighted = {}
+        for token, count in counts.items():
+            if token in idf:
+                weighted[token] = count
+                continue
+            expansions = [(term, similarity) for term, similarity in expand(token) if term not in counts]
+            for term, similarity in expansions:
+                weighted[term] = weighted.get(term, 0) + count * similarity
+            dropped.append((token, "not indexed" if not expansions else
+                            "not indexed, matched " + ", ".join(f"{term} ({similarity:.2f})"
+                                                                 for term, similarity in expansions)))
+        counts = weighted
+    else:
+        dropped = [(term, "not indexed") for term in counts if term not in idf]
+    terms = [term for term in counts if term in idf]
+    common = [term for term in terms if idf[term] < QUERY_MIN_IDF]
+    if common and len(common) < len(terms):
+        dropped.extend((term, f"idf {idf[term]:.3f} < {QUERY_MIN_IDF}") for term in common)
+        terms = [term for term in terms if idf[term] >= QUERY_MIN_IDF]
+    if len(terms) > QUERY_MAX_TERMS:
+        by_bound = sorted(terms, key=lambda t: -counts[t] * max_impacts[t])
+        weakest = set(by_bound[QUERY_MAX_TERMS:])
+        dropped.extend((term, f"over {QUERY_MAX_TERMS} terms") for term in by_bound[QUERY_MAX_TERMS:])
+        terms = [term for term in terms if term not in weakest]
+    return [(term, counts[term]) for term in terms], dropped
+
 
 # ============ BM25 IMPLEMENTATION ============
 class BM25:
-    """BM25 ranking algorithm for text search"""
+    """BM25 ranking algorithm for text search (inverted-index backed)
 
-    def __init__(self, k1=1.5, b=0.75):
+    With field_weights (one per search column), documents are lists of field
+    texts and scoring is BM25F: a term's frequency and a document's length
+    are the weighted sums over its fields, so a hit in a heavily weighted
+    field counts as several hits. With every weight 1 this is plain BM25
+    over the joined fields.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, field_weights=None):
         self.k1 = k1
         self.b = b
-        self.corpus = []
-        self.doc_lengths = []
+        self.field_weights = list(field_weights) if field_weights else None
+        # Integral weights keep frequencies and lengths integral (and compact)
+        self._freq_type = "I" if all(float(w).is_integer() for w in self.field_weights or ()) else "d"
+        self.postings = {}
+        self.doc_lengths = array(self._freq_type)
+        self.doc_norms = array("d")
+        self.max_impacts = {}
         self.avgdl = 0
         self.idf = {}
         self.doc_freqs = defaultdict(int)
         self.N = 0
+        self.total_length = 0
+        self.tombstones = set()
+        self._forward = None
+        self._stale = False
+        self._numpy_index = None
+        self._term_index = None
 
-    def tokenize(self, text):
-        """Lowercase, split, remove punctuation, filter short words"""
-        text = re.sub(r'[^\w\s]', ' ', str(text).lower())
-        return [w for w in text.split() if len(w) > 2]
+    @staticmethod
+    def tokenize(text):
+        """Lowercase, split, remove punctuation, filter short words (see tokenizer.py)"""
+        return tokenizer.tokenize(text)
 
     def fit(self, documents):
-        """Build BM25 index from documents"""
-        self.corpus = [self.tokenize(doc) for doc in documents]
-        self.N = len(self.corpus)
+        """Build postings lists (term -> doc ids, term frequencies) from documents"""
+        self.postings = {}
+        self.doc_lengths = array(self._freq_type)
+        self.total_length = 0
+        self.tombstones = set()
+        self._forward = None
+        self._term_index = None
+        for doc in documents:
+            self.add_document(doc)
+        self.finalize()
+
+    def add_document(self, doc):
+        """Tokenize one document (a string, or one text per field) and append it to the postings; returns its id
+
+        Postings grow incrementally so a corpus can be streamed in without
+        holding its text. Collection statistics (idf, avgdl, bounds) are
+        recomputed by finalize(), which queries call lazily when needed.
+        """
+        idx = len(self.doc_lengths)
+        self.doc_lengths.append(0)
+        if self._forward is not None:
+            self._forward.append({})
+        self._index_document(idx, doc)
+        return idx
+
+    def remove_document(self, idx):
+        """Drop a document from the index; its id becomes a tombstone and is never reused"""
+        if idx in self.tombstones or not 0 <= idx < len(self.doc_lengths):
+            raise KeyError(idx)
+        self._unindex_document(idx)
+        self.tombstones.add(idx)
+
+    def replace_document(self, idx, doc):
+        """Re-index a document in place, keeping its id (and so its tie-break order)"""
+        if not 0 <= idx < len(self.doc_lengths):
+            raise KeyError(idx)
+        if idx in self.tombstones:
+            self.tombstones.discard(idx)
+        else:
+            self._unindex_document(idx)
+        self._index_document(idx, doc)
+
+    def _analyze(self, doc):
+        """(term -> weighted frequency, weighted length) of a document"""
+        term_freqs = {}
+        if isinstance(doc, str):
+            tokens = self.tokenize(doc)
+            for word in tokens:
+                term_freqs[word] = term_freqs.get(word, 0) + 1
+            return term_freqs, len(tokens)
+
+        length = 0
+        for text, weight in zip(doc, self.field_weights or [1] * len(doc)):
+            tokens = self.tokenize(text)
+            length += weight * len(tokens)
+            for word in tokens:
+                term_freqs[word] = term_freqs.get(word, 0) + weight
+        return term_freqs, length
+
+    def _index_document(self, idx, doc):
+        """Add one document's terms to the postings (a term's doc frequency is its postings length)"""
+        term_freqs, length = self._analyze(doc)
+        for word, tf in term_freqs.items():
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = (array("I"), array(self._freq_type))
+                self._term_index = None
+            doc_ids, tfs = postings
+            if not doc_ids or doc_ids[-1] < idx:
+                doc_ids.append(idx)
+                tfs.append(tf)
+            else:
+                # Replacing an earlier document: keep postings sorted by id
+                pos = bisect_left(doc_ids, idx)
+                doc_ids.insert(pos, idx)
+                tfs.insert(pos, tf)
+
+        self.doc_lengths[idx] = length
+        self.total_length += length
+        if self._forward is not None:
+            self._forward[idx] = term_freqs
+        self._stale = True
+
+    def _unindex_document(self, idx):
+        """Remove one document's terms from the postings and lengths"""
+        for word in self._get_forward()[idx]:
+            doc_ids, tfs = self.postings[word]
+            pos = bisect_left(doc_ids, idx)
+            del doc_ids[pos]
+            del tfs[pos]
+            if not doc_ids:
+                del self.postings[word]
+                self._term_index = None
+
+        self.total_length -= self.doc_lengths[idx]
+        self.doc_lengths[idx] = 0
+        self._forward[idx] = {}
+        self._stale = True
+
+    def _get_forward(self):
+        """Per-document {term: tf}, built from the postings on the first update"""
+        if self._forward is None:
+            forward = [{} for _ in self.doc_lengths]
+            for word, (doc_ids, tfs) in self.postings.items():
+                for idx, tf in zip(doc_ids, tfs):
+                    forward[idx][word] = tf
+            self._forward = forward
+        return self._forward
+
+    def collection_stats(self):
+        """(live documents, total length, {term: doc frequency}) of this index"""
+        return (len(self.doc_lengths) - len(self.tombstones), self.total_length,
+                {word: len(doc_ids) for word, (doc_ids, _) in self.postings.items()})
+
+    def finalize(self, collection=None):
+        """Recompute idf, avgdl and score bounds from the current postings
+
+        collection=(N, total length, doc frequencies) substitutes the
+        statistics of a larger collection, so that a shard scores its
+        documents exactly as the full index would.
+        """
+        if collection is None:
+            collection = self.collection_stats()
+        self.N, total_length, doc_freqs = collection
+        self.doc_freqs = defaultdict(int, {word: doc_freqs[word] for word in self.postings})
+        self.idf = {}
+        self._stale = False
         if self.N == 0:
+            self.doc_norms = array("d")
+            self.max_impacts = {}
+            self._numpy_index = None
             return
-        self.doc_lengths = [len(doc) for doc in self.corpus]
-        self.avgdl = sum(self.doc_lengths) / self.N
-
-        for doc in self.corpus:
-            seen = set()
-            for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
+        self.avgdl = total_length / self.N
 
         for word, freq in self.doc_freqs.items():
             self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
 
+        self._compute_norms()
+
+    def _compute_norms(self):
+        """Precompute document length normalisation and per-term score upper bounds"""
+        self.doc_norms = array("d", (self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+                                     for doc_len in self.doc_lengths))
+
+        self._numpy_index = None
+
+        # MaxScore bound: the largest contribution a term makes to any document
+        numerator_scale = self.k1 + 1
+        doc_norms = self.doc_norms
+        self.max_impacts = {}
+        for word, (doc_ids, tfs) in self.postings.items():
+            idf = self.idf[word]
+            self.max_impacts[word] = max(idf * (tf * numerator_scale) / (tf + doc_norms[idx])
+                                         for idx, tf in zip(doc_ids, tfs))
+
+    def query_bound(self, tokens):
+        """Most any document could score for these tokens, used to normalize scores across indexes
+
+        Each term counts its largest impact here, or for a term this index
+        lacks, the impact of a term that occurs in one document (so missing
+        terms lower the normalized score instead of being ignored).
+        """
+        if self._stale:
+            self.finalize()
+        unseen = log((self.N - 1 + 0.5) / 1.5 + 1) * (self.k1 + 1) if self.N else 0.0
+        return sum(self.max_impacts.get(token, unseen) for token in tokens)
+
+    def expand(self, token):
+        """[(term, similarity)] indexed terms close to a token this index lacks (see TermIndex)"""
+        if self._term_index is None:
+            self._term_index = TermIndex(self.postings)
+        return self._term_index.expand(token)
+
+    def plan(self, query):
+        """Terms to score for a query: ([(term, weight)], [(term, reason)] dropped); see plan_query()"""
+        if self._stale:
+            self.finalize()
+        return plan_query(query, self.idf, self.max_impacts, self.expand)
+
+    def _planned(self, query):
+        """(term, weight) pairs to score: the plan of a query string, or of an already planned
+        query (a shard gets one planned over the whole collection) the terms this index holds"""
+        if self._stale:
+            self.finalize()
+        if isinstance(query, str):
+            return self.plan(query)[0]
+        return [(term, weight) for term, weight in query if term in self.postings]
+
+    def explain(self, query):
+        """The plan for a query as a dict, with each term's idf, bound and postings length"""
+        terms, dropped = self.plan(query)
+        return {
+            "query": query,
+            "tokens": len(tokenize_query(query)),
+            "terms": [{"term": term, "weight": weight, "idf": self.idf[term],
+                       "max_impact": weight * self.max_impacts[term], "postings": len(self.postings[term][0])}
+                      for term, weight in terms],
+            "dropped": [{"term": term, "reason": reason} for term, reason in dropped],
+            "postings": sum(len(self.postings[term][0]) for term, _ in terms),
+            "documents": self.N
+        }
+
+    def to_state(self):
+        """Export the fitted index as plain data (for the on-disk cache)"""
+        if self._stale:
+            self.finalize()
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "field_weights": self.field_weights,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+            "avgdl": self.avgdl,
+            "idf": self.idf,
+            "doc_freqs": dict(self.doc_freqs),
+            "tombstones": sorted(self.tombstones),
+            "N": self.N,
+            "doc_norms": self.doc_norms,
+            "max_impacts": self.max_impacts
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted index from to_state() output"""
+        bm25 = cls(state["k1"], state["b"], state["field_weights"])
+        bm25.postings = state["postings"]
+        bm25.doc_lengths = state["doc_lengths"]
+        bm25.avgdl = state["avgdl"]
+        bm25.idf = state["idf"]
+        bm25.doc_freqs = defaultdict(int, state["doc_freqs"])
+        bm25.tombstones = set(state["tombstones"])
+        bm25.total_length = sum(bm25.doc_lengths)
+        bm25.N = state["N"]
+        # Stored rather than recomputed: rebuilding them is most of a load
+        bm25.doc_norms = state["doc_norms"]
+        bm25.max_impacts = state["max_impacts"]
+        return bm25
+
     def score(self, query):
-        """Score all documents against query"""
-        query_tokens = self.tokenize(query)
-        scores = []
+        """Score all documents against query, touching only postings of query terms"""
+        terms = self._planned(query)
+        scores = [0] * len(self.doc_lengths)
+        numerator_scale = self.k1 + 1
+        doc_norms = self.doc_norms
 
-        for idx, doc in enumerate(self.corpus):
-            score = 0
-            doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
+        # Accumulate term by term in query order so every document's sum is
+        # built in the same order as a full per-document scan.
+        for token, weight in terms:
+            idf = self.idf[token]
+            for idx, tf in zip(*self.postings[token]):
+                scores[idx] += weight * (idf * (tf * numerator_scale) / (tf + doc_norms[idx]))
 
-            for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
-                    idf = self.idf[token]
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
-                    score += idf * numerator / denominator
+        return sorted(enumerate(scores), key=lambda x: x[1], reverse=True)
 
-            scores.append((idx, score))
+    def _top_k_python(self, query, k):
+        """Best k (idx, score) pairs with score > 0, identical to the head of score()
 
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+        Documents are visited in id order (document-at-a-time) while a bounded
+        min-heap keeps the current top k. Query terms are ordered by their
+        score upper bound; once the bounds of the weakest terms add up to no
+        more than the k-th best score, documents that only contain those
+        terms are skipped (MaxScore), as are candidates whose bound cannot
+        beat the heap. Ties keep the lower id, like the stable sort in score().
+        """
+        if k <= 0 or self.N == 0:
+            return []
+        query_terms = self._planned(query)
+        if not query_terms:
+            return []
 
+        # (term, weight, idf) in query order, the order scores are summed in
+        scoring = [(token, weight, self.idf[token]) for token, weight in query_terms]
+        weights = dict(query_terms)
+        terms = sorted(weights, key=lambda t: weights[t] * self.max_impacts[t])
+        # Inflate bounds slightly so float rounding can never prune a true candidate
+        bounds = [weights[t] * self.max_impacts[t] * (1 + 1e-9) for t in terms]
+        prefix_bounds = [0.0]
+        for bound in bounds:
+            prefix_bounds.append(prefix_bounds[-1] + bound)
 
-# ============ SEARCH FUNCTIONS ============
+        term_postings = [self.postings[t] for t in terms]
+        cursors = [0] * len(terms)
+        end = len(self.doc_lengths)
+        numerator_scale = self.k1 + 1
+        doc_norms = self.doc_norms
+        heap = []
+        threshold = 0.0
+        first_essential = 0
+
+        while True:
+            # Next candidate: lowest current doc id among the essential terms
+            doc = end
+            for i in range(first_essential, len(terms)):
+                doc_ids = term_postings[i][0]
+                if cursors[i] < len(doc_ids) and doc_ids[cursors[i]] < doc:
+                    doc = doc_ids[cursors[i]]
+            if doc == end:
+                break
+
+            tfs = {}
+            bound = prefix_bounds[first_essential]
+            for i in range(first_essential, len(terms)):
+                doc_ids, freqs = term_postings[i]
+                if cursors[i] < len(doc_ids) and doc_ids[cursors[i]] == doc:
+                    tfs[terms[i]] = freqs[cursors[i]]
+                    cursors[i] += 1
+                    bound += bounds[i]
+            if len(heap) == k and bound <= threshold:
+                continue
+
+            # Probe the non-essential terms, strongest first
+            for i in range(first_essential - 1, -1, -1):
+                doc_ids, freqs = term_postings[i]
+                pos = bisect_left(doc_ids, doc, cursors[i])
+                cursors[i] = pos
+                if pos < len(doc_ids) and doc_ids[pos] == doc:
+                    tfs[terms[i]] = freqs[pos]
+                else:
+                    bound -= bounds[i]
+                    if len(heap) == k and bound <= threshold:
+                        break
+            else:
+                score = 0
+                doc_norm = doc_norms[doc]
+                for token, weight, idf in scoring:
+                    tf = tfs.get(token)
+                    if tf:
+                        score += weight * (idf * (tf * numerator_scale) / (tf + doc_norm))
+
+                entry = (score, -doc)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    continue
+                if len(heap) == k:
+                    threshold = heap[0][0]
+                    while first_essential < len(terms) and prefix_bounds[first_essential + 1] <= threshold:
+                        first_essential += 1
+
+        return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
+
+    def top_k(self, query, k, backend=None):
+        """Best k (idx, score) pairs with score > 0, on the selected backend
+
+        query is a string or already planned (term, weight) pairs (see _planned).
+        """
+        if self._stale:
+            self.finalize()
+        if _resolve_backend(backend) == "numpy" and self.N and k > 0:
+            return self._top_k_from_scores(self._score_vector(self._planned(query)), k)
+        return self._top_k_python(query, k)
+
+    def top_k_batch(self, queries, k, backend=None):
+        """top_k() for many queries; the numpy backend scores them with sparse matrix products"""
+        if self._stale:
+            self.finalize()
+        if _resolve_backend(backend) == "python" or not self.N or k <= 0:
+            return [self._top_k_python(query, k) for query in queries]
+
+        numpy, sparse = _load_numpy()
+        plans = [self._planned(query) for query in queries]
+        if sparse is None:
+            return [self._top_k_from_scores(self._score_vector(terms), k) for terms in plans]
+
+        # One sparse product per chunk: (docs x terms) weights @ (terms x queries) term weights
+        term_ids, _, matrix = self._get_numpy_index()
+        results = []
+        chunk = 1024
+        for start in range(0, len(plans), chunk):
+            rows, cols, data = [], [], []
+            for j, terms in enumerate(plans[start:start + chunk]):
+                for token, weight in terms:
+                    rows.append(term_ids[token])
+                    cols.append(j)
+                    data.append(weight)
+            width = min(chunk, len(plans) - start)
+            queries_matrix = sparse.csc_matrix((numpy.asarray(data, dtype=numpy.float64), (rows, cols)),
+                                               shape=(len(term_ids), width))
+            scores = (matrix @ queries_matrix).tocsc()
+            for j in range(width):
+                lo, hi = scores.indptr[j], scores.indptr[j + 1]
+                results.append(self._top_k_from_candidates(scores.indices[lo:hi], scores.data[lo:hi], k))
+        return results
+
+    def _get_numpy_index(self):
+        """Per-term (doc ids, BM25 weights) arrays and the sparse doc-term weight matrix"""
+        if self._numpy_index is None:
+            numpy, sparse = _load_numpy()
+            numerator_scale = self.k1 + 1
+            doc_norms = self.doc_norms
+            term_ids = {}
+            arrays = {}
+            for word, (doc_ids, tfs) in self.postings.items():
+                term_ids[word] = len(term_ids)
+                weights = [self.idf[word] * (tf * numerator_scale) / (tf + doc_norms[idx])
+                           for idx, tf in zip(doc_ids, tfs)]
+                arrays[word] = (numpy.asarray(doc_ids, dtype=numpy.int64), numpy.asarray(weights, dtype=numpy.float64))
+
+            matrix = None
+            if sparse is not None and arrays:
+                indptr = numpy.cumsum([0] + [len(ids) for ids, _ in arrays.values()])
+                indices = numpy.concatenate([ids for ids, _ in arrays.values()])
+                data = numpy.concatenate([weights for _, weights in arrays.values()])
+                matrix = sparse.csc_matrix((data, indices, indptr), shape=(len(self.doc_lengths), len(term_ids))).tocsr()
+            self._numpy_index = (term_ids, arrays, matrix)
+        return self._numpy_index
+
+    def _score_vector(self, terms):
+        """Dense score vector for planned (term, weight) pairs, summed in query order like score()"""
+        numpy, _ = _load_numpy()
+        _, arrays, _ = self._get_numpy_index()
+        scores = numpy.zeros(len(self.doc_lengths))
+        for token, weight in terms:
+            doc_ids, weights = arrays[token]
+            scores[doc_ids] += weight * weights
+        return scores
+
+    def _top_k_from_scores(self, scores, k):
+        """Top-k (idx, score) from a dense score vector"""
+        numpy, _ = _load_numpy()
+        candidates = numpy.flatnonzero(scores > 0)
+        return self._top_k_from_candidates(candidates, scores[candidates], k)
+
+    def _top_k_from_candidates(self, candidates, scores, k):
+        """Top-k (idx, score) from candidate doc ids and their scores, ties broken by lower idx"""
+        numpy, _ = _load_numpy()
+        positive = scores > 0
+        candidates, scores = candidates[positive], scores[positive]
+        if len(candidates) > k:
+            # Keep everything tied with the k-th score so the tie-break stays exact
+            kth = numpy.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            candidates, scores = candidates[keep], scores[keep]
+        order = numpy.lexsort((candidates, -scores))[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+
+# ============ ROW STORAGE ============
+class RowView:
+    """Lightweight view of one stored row; nothing is copied until to_dict()"""
+
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store, idx):
+        self.store = store
+        self.idx = idx
+
+    def __getitem__(self, column):
+        return self.store.value(self.idx, column)
+
+    def get(self, column, default=None):
+        return self.store.value(self.idx, column) if column in self.store.positions else default
+
+    def to_dict(self, columns=None):
+        return self.store.materialize(self.idx, columns)
+
+
+class ColumnStore:
+    """Output rows stored column-wise: interned column names, one list per column
+
+    Short repeated values (severity, platform, category ...) are interned so
+    every row shares one string object. Rows are only turned into dicts for
+    the hits that are actually returned. Each row also keeps its stable key
+    and a checksum of its contents so edited files can be diffed row by row.
+    """
+
+    __slots__ = ("columns", "positions", "data", "keys", "checksums")
+
+    INTERN_MAX_LEN = 64
+
+    def __init__(self, columns):
+        self.columns = tuple(sys.intern(col) for col in columns)
+        self.positions = {col: pos for pos, col in enumerate(self.columns)}
+        self.data = [[] for _ in self.columns]
+        self.keys = []
+        self.checksums = array("I")
+
+    def _cell(self, row, col):
+        value = row.get(col, "")
+        if type(value) is str and len(value) <= self.INTERN_MAX_LEN:
+            value = sys.intern(value)
+        return value
+
+    def append(self, row, key=None, checksum=0):
+        """Append a row (mapping); missing columns are stored as ''"""
+        for col, values in zip(self.columns, self.data):
+            values.append(self._cell(row, col))
+        self.keys.append(key)
+        self.checksums.append(checksum)
+
+    def replace(self, idx, row, key=None, checksum=0):
+        """Overwrite the row stored at idx"""
+        for col, values in zip(self.columns, self.data):
+            values[idx] = self._cell(row, col)
+        self.keys[idx] = key
+        self.checksums[idx] = checksum
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, idx):
+        return RowView(self, idx)
+
+    def value(self, idx, column):
+        return self.data[self.positions[column]][idx]
+
+    def materialize(self, idx, columns=None):
+        """Dict of the requested columns (default: all) for one row"""
+        if columns is None:
+            return {col: values[idx] for col, values in zip(self.columns, self.data)}
+        return {col: self.data[self.positions[col]][idx] for col in columns if col in self.positions}
+
+    def to_state(self):
+        """Export as plain data (for the on-disk cache)"""
+        return {"columns": list(self.columns), "data": self.data, "keys": self.keys, "checksums": self.checksums}
+
+    @classmethod
+    def from_state(cls, state):
+        store = cls(state["columns"])
+        store.data = state["data"]
+        store.keys = state["keys"]
+        store.checksums = state["checksums"]
+        for values in store.data:
+            for i, value in enumerate(values):
+                if type(value) is str and len(value) <= cls.INTERN_MAX_LEN:
+                    values[i] = sys.intern(value)
+        return store
+
+
+# ============ INDEX BUILDING ============
+# csv, hashlib and pickle are imported where they are used: a search answered
+# by the server (or from a warm registry) never needs them.
 def _load_csv(filepath):
     """Load CSV and return list of dicts"""
+    return list(_iter_csv(filepath))
+
+
+def _iter_csv(filepath):
+    """Yield CSV rows as dicts one at a time"""
+    import csv
     with open(filepath, 'r', encoding='utf-8') as f:
-        return list(csv.DictReader(f))
+        yield from csv.DictReader(f)
 
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
-    """Core search function using BM25"""
-    if not filepath.exists():
-        return []
+def _row_fields(row, search_cols):
+    """Texts indexed for a row: one per search column"""
+    return [str(row.get(col, "")) for col in search_cols]
 
-    data = _load_csv(filepath)
 
-    # Build documents from search columns
-    documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
+def _field_weights(config):
+    """BM25F weights aligned with a config's search_cols (unlisted columns weigh 1)"""
+    weights = config.get("field_weights", {})
+    return [weights.get(col, 1) for col in config["search_cols"]]
 
-    # BM25 search
-    bm25 = BM25()
-    bm25.fit(documents)
-    ranked = bm25.score(query)
 
-    # Get top results with score > 0
-    results = []
-    for idx, score in ranked[:max_results]:
-        if score > 0:
-            row = data[idx]
-            results.append({col: row.get(col, "") for col in output_cols if col in row})
+def _row_checksum(fields, row, columns):
+    """CRC32 of a row's search texts and stored columns (change detection only)"""
+    import zlib
+    text = "\x1f".join(fields + [str(row.get(col, "")) for col in columns])
+    return zlib.crc32(text.encode("utf-8"))
 
-    return results
+
+def _build_index(filepath, search_cols, output_cols, field_weights=None):
+    """Stream a CSV into a BM25F index over its search columns and a column store
+
+    Rows are consumed one at a time, so peak memory is the index plus the
+    stored output columns rather than the raw file and its tokens.
+    """
+    bm25 = BM25(field_weights=field_weights)
+    rows = None
+    for row in _iter_csv(filepath):
+        if rows is None:
+            # Keep only the output columns present in the file, column-wise
+            rows = ColumnStore([col for col in output_cols if col in row])
+        fields = _row_fields(row, search_cols)
+        bm25.add_document(fields)
+        rows.append(row, row.get(ROW_KEY), _row_checksum(fields, row, rows.columns))
+    bm25.finalize()
+    return bm25, rows if rows is not None else ColumnStore([])
+
+
+# ============ DISK STORE ============
+def _atomic_pickle(path, payload):
+    """Pickle payload to path through a sibling temp file, so readers only ever see a complete file"""
+    import pickle
+    import tempfile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class DiskStore:
+    """Size-bounded directory of pickled (key, value) entries, one file per key
+
+    Files are named by a hash of the key, and the key stored with the value
+    must match on read. File mtime is the LRU clock: reads touch it, and a
+    write that takes the store past maxsize drops the least recently used
+    entries. The entry count is taken from the directory on the first write
+    and then tracked, so ordinary writes do not list the directory.
+    Read and write failures only cost a recomputation.
+    """
+
+    def __init__(self, directory, maxsize):
+        self.directory = Path(directory)
+        self.maxsize = maxsize
+        self._count = None
+
+    def _path(self, key):
+        import hashlib
+        return self.directory / f"{hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]}.pickle"
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(".pickle")]
+
+    def get(self, key):
+        """Stored value for key (unpickled, so a fresh copy), or None"""
+        import pickle
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError, ValueError):
+            return None
+        return value if stored_key == key else None
+
+    def put(self, key, value):
+        """Store value for key"""
+        path = self._path(key)
+        try:
+            new = not path.exists()
+            _atomic_pickle(path, (key, value))
+            if self._count is None:
+                self._count = len(self._entries())
+            elif new:
+                self._count += 1
+            if self._count > self.maxsize:
+                self._evict()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop the least recently used entry files down to maxsize"""
+        entries = self._entries()
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in entries[:len(entries) - self.maxsize]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+        self._count = min(len(entries), self.maxsize)
+
+    def clear(self):
+        """Delete every entry"""
+        if self.directory.exists():
+            for entry in os.scandir(self.directory):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+        self._count = 0
+
+
+# ============ INDEX CACHE ============
+_digests = {}
+
+
+def _file_digest(filepath):
+    """SHA-256 of a file's contents (the data version), re-hashed only when its stat changes"""
+    import hashlib
+    stat = os.stat(filepath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    memo = _digests.get(str(filepath))
+    if memo is not None and memo[0] == signature:
+        return memo[1]
+
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    _digests[str(filepath)] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _index_cache_path(filepath, search_cols, output_cols, field_weights=None):
+    """Cache file for one data file + column layout"""
+    import hashlib
+    layout = repr((INDEX_CACHE_VERSION, str(Path(filepath).resolve()), search_cols, output_cols, field_weights,
+                   tokenizer.config()))
+    key = hashlib.sha256(layout.encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / f"{Path(filepath).stem}-{key}.pickle"
+
+
+def _read_index_cache(cache_path, digest):
+    """Return cached (bm25, rows) if it was compiled from the same file contents"""
+    import pickle
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get("digest") != digest:
+            return None
+        return BM25.from_state(cached["bm25"]), ColumnStore.from_state(cached["rows"])
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _write_index_cache(cache_path, digest, bm25, rows):
+    """Atomically write a compiled index; failures only cost a rebuild next time"""
+    try:
+        _atomic_pickle(cache_path, {"digest": digest, "bm25": bm25.to_state(), "rows": rows.to_state()})
+    except OSError:
+        pass
+
+
+def _load_index(filepath, search_cols, output_cols, field_weights=None):
+    """Load a compiled index, rebuilding it when the data file has changed
+
+    Returns (bm25, rows, digest of the file contents the index was built from).
+    """
+    digest = _file_digest(filepath)
+    if not CACHE_ENABLED:
+        return _build_index(filepath, search_cols, output_cols, field_weights) + (digest,)
+
+    cache_path = _index_cache_path(filepath, search_cols, output_cols, field_weights)
+    cached = _read_index_cache(cache_path, digest)
+    if cached is not None:
+        return cached + (digest,)
+
+    bm25, rows = _build_index(filepath, search_cols, output_cols, field_weights)
+    _write_index_cache(cache_path, digest, bm25, rows)
+    return bm25, rows, digest
+
+
+# ============ RESULT CACHE ============
+class ResultCache:
+    """Bounded LRU of search results keyed by (query tokens, domain/stack, max_results, data version)
+
+    Entries live in memory; with persist=True each entry is also written to
+    a DiskStore under CACHE_DIR/results so later CLI invocations can answer
+    repeated queries without loading any index. A changed data file has a
+    new version, so its old entries simply stop matching and age out.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, persist=RESULT_CACHE_PERSIST, directory=None):
+        self.maxsize = maxsize
+        self.persist = persist
+        self.disk = DiskStore(directory or CACHE_DIR / "results", maxsize)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached results for key (a fresh copy), or None"""
+        results = self._entries.get(key)
+        if results is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(row) for row in results]
+
+        if self.persist:
+            results = self.disk.get(key)
+            if results is not None:
+                self._remember(key, results)
+                self.disk_hits += 1
+                return [dict(row) for row in results]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, results):
+        """Store results for key"""
+        results = [dict(row) for row in results]
+        self._remember(key, results)
+        if self.persist:
+            self.disk.put(key, results)
+
+    def _remember(self, key, results):
+        self._entries[key] = results
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self, disk=False):
+        """Drop all in-memory entries (and the on-disk ones with disk=True)"""
+        self._entries.clear()
+        if disk:
+            self.disk.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "persist": self.persist
+        }
+
+
+result_cache = ResultCache()
+
+
+def cache_stats():
+    """Hit/miss counters of the process-wide result cache"""
+    return result_cache.stats()
+
+
+# ============ CORPUS REGISTRY ============
+class Corpus:
+    """Fitted BM25 index plus the output rows of one data file"""
+
+    def __init__(self, filepath, bm25, rows, version):
+        self.filepath = filepath
+        self.bm25 = bm25
+        self.rows = rows
+        self.version = version
+        # Tokenizer options the index was built with (see tokenizer.configure)
+        self.tokenizer_config = tokenizer.config()
+        self._key_index = None
+
+    def search(self, query, max_results, backend=None, columns=None):
+        """Return output rows (optionally only some columns) of the top results with score > 0"""
+        return [self.rows.materialize(idx, columns) for idx, _ in self.bm25.top_k(query, max_results, backend)]
+
+    def search_batch(self, queries, max_results, backend=None, columns=None):
+        """search() for many queries at once"""
+        return [[self.rows.materialize(idx, columns) for idx, _ in ranked]
+                for ranked in self.bm25.top_k_batch(queries, max_results, backend)]
+
+    def _get_key_index(self):
+        """{row key: doc id} of live rows; ValueError when keys are missing or repeated"""
+        if self._key_index is None:
+            index = {}
+            tombstones = self.bm25.tombstones
+            for idx, key in enumerate(self.rows.keys):
+                if idx in tombstones:
+                    continue
+                if not key or key in index:
+                    raise ValueError(f"{self.filepath.name}: rows have no unique {ROW_KEY!r} key")
+                index[key] = idx
+            self._key_index = index
+        return self._key_index
+
+    def sync(self, rows, search_cols, output_cols):
+        """Update the index in place from a new version of the file's rows
+
+        Rows are matched by ROW_KEY: new keys are appended, rows whose
+        checksum changed are re-indexed under their existing id (so ties keep
+        their order) and missing keys are tombstoned. Only the touched
+        postings change; idf and bounds are recomputed lazily on the next
+        query. Returns (added, changed, removed).
+
+        Raises ValueError when the file cannot be diffed (missing or repeated
+        keys, different columns); the corpus must then be rebuilt.
+        """
+        key_index = self._get_key_index()
+        seen = set()
+        added = changed = 0
+        for row in rows:
+            if not seen and [col for col in output_cols if col in row] != list(self.rows.columns):
+                raise ValueError(f"{self.filepath.name}: columns changed")
+            key = row.get(ROW_KEY)
+            if not key or key in seen:
+                raise ValueError(f"{self.filepath.name}: rows have no unique {ROW_KEY!r} key")
+            seen.add(key)
+
+            fields = _row_fields(row, search_cols)
+            checksum = _row_checksum(fields, row, self.rows.columns)
+            idx = key_index.get(key)
+            if idx is None:
+                key_index[key] = self.bm25.add_document(fields)
+                self.rows.append(row, key, checksum)
+                added += 1
+            elif self.rows.checksums[idx] != checksum:
+                self.bm25.replace_document(idx, fields)
+                self.rows.replace(idx, row, key, checksum)
+                changed += 1
+
+        removed = [key for key in key_index if key not in seen]
+        for key in removed:
+            self.bm25.remove_document(key_index.pop(key))
+        return added, changed, len(removed)
+
+
+class CorpusRegistry:
+    """Process-wide registry that loads and fits each domain/stack once
+
+    With auto_refresh on (the server enables it), every lookup checks the
+    file's version and applies edits in place via refresh().
+    """
+
+    def __init__(self, auto_refresh=False):
+        self.auto_refresh = auto_refresh
+        self._federated = None
+        self._corpora = {}
+        self._tables = {}
+        self._table_versions = {}
+
+    def _spec(self, key):
+        """Resolve a registry key to (filepath, search_cols, output_cols, field_weights)"""
+        kind, name = key
+        if kind == "stack":
+            config, filepath = _STACK_COLS, DATA_DIR / STACK_CONFIG[name]["file"]
+        else:
+            config = CSV_CONFIG[name]
+            filepath = DATA_DIR / config["file"]
+        return filepath, config["search_cols"], config["output_cols"], _field_weights(config)
+
+    def _get(self, key):
+        corpus = self._corpora.get(key)
+        if corpus is not None and corpus.tokenizer_config != tokenizer.config():
+            corpus = None  # tokenized with other options: rebuild before it answers (or fills the result cache)
+        if corpus is None:
+            filepath, search_cols, output_cols, field_weights = self._spec(key)
+            bm25, rows, version = _load_index(filepath, search_cols, output_cols, field_weights)
+            corpus = self._corpora[key] = Corpus(filepath, bm25, rows, version)
+        elif self.auto_refresh:
+            self._refresh(key)
+            corpus = self._corpora[key]
+        return corpus
+
+    def _refresh(self, key):
+        """Sync one loaded corpus with its file; returns (added, changed, removed) or None if unchanged"""
+        corpus = self._corpora[key]
+        filepath, search_cols, output_cols, field_weights = self._spec(key)
+        version = _file_digest(filepath)
+        if version == corpus.version:
+            return None
+        try:
+            counts = corpus.sync(_iter_csv(filepath), search_cols, output_cols)
+        except ValueError:
+            # Not diffable: rebuild (the half-synced corpus is discarded)
+            bm25, rows, version = _load_index(filepath, search_cols, output_cols, field_weights)
+            self._corpora[key] = Corpus(filepath, bm25, rows, version)
+            return len(rows), 0, len(corpus.rows.keys) - len(corpus.bm25.tombstones)
+        corpus.version = version
+        return counts
+
+    def refresh(self, domain=None, stack=None):
+        """Apply file edits to loaded corpora in place (no arguments: all of them)
+
+        Returns {key: (added, changed, removed)} for every corpus whose file
+        changed; edited tables are simply reloaded.
+        """
+        if domain is None and stack is None:
+            keys = list(self._corpora)
+            for filename, version in list(self._table_versions.items()):
+                filepath = DATA_DIR / filename
+                if not filepath.exists() or _file_digest(filepath) != version:
+                    self.invalidate(table=filename)
+        else:
+            keys = [key for key in (("domain", domain), ("stack", stack)) if key in self._corpora]
+        changes = {}
+        for key in keys:
+            counts = self._refresh(key)
+            if counts is not None:
+                changes[key] = counts
+        return changes
+
+    def get(self, domain):
+        """Corpus for a CSV_CONFIG domain"""
+        return self._get(("domain", domain))
+
+    def get_stack(self, stack):
+        """Corpus for a STACK_CONFIG stack"""
+        return self._get(("stack", stack))
+
+    def federated(self, domains=None):
+        """FederatedIndex over the domains (default: all) whose data file exists, rebuilt when any of them is reloaded"""
+        corpora = {domain: self.get(domain) for domain in domains or CSV_CONFIG
+                   if (DATA_DIR / CSV_CONFIG[domain]["file"]).exists()}
+        if self._federated is None or self._federated.corpora != list(corpora.values()):
+            self._federated = FederatedIndex(corpora)
+        return self._federated
+
+    def table(self, filename):
+        """Raw rows of a data file that is not searched (e.g. ui-reasoning.csv)"""
+        rows = self._tables.get(filename)
+        filepath = DATA_DIR / filename
+        if rows is not None and self.auto_refresh and filepath.exists():
+            if _file_digest(filepath) != self._table_versions.get(filename):
+                rows = None
+        if rows is None:
+            if filepath.exists():
+                self._table_versions[filename] = _file_digest(filepath)
+                rows = _load_csv(filepath)
+            else:
+                rows = []
+            self._tables[filename] = rows
+        return rows
+
+    def invalidate(self, domain=None, stack=None, table=None):
+        """Drop cached entries so they are reloaded on next use (no arguments drops everything)"""
+        if domain is None and stack is None and table is None:
+            self._federated = None
+            self._corpora.clear()
+            self._tables.clear()
+            self._table_versions.clear()
+            return
+        if domain is not None:
+            self._federated = None
+            self._corpora.pop(("domain", domain), None)
+        if stack is not None:
+            self._corpora.pop(("stack", stack), None)
+        if table is not None:
+            self._tables.pop(table, None)
+            self._table_versions.pop(table, None)
+
+    def reload(self):
+        """Reload every entry that is currently loaded"""
+        keys = list(self._corpora)
+        tables = list(self._tables)
+        self.invalidate()
+        for key in keys:
+            self._get(key)
+        for filename in tables:
+            self.table(filename)
+
+
+registry = CorpusRegistry()
+
+
+def invalidate(domain=None, stack=None, table=None):
+    """Invalidate entries of the process-wide registry"""
+    registry.invalidate(domain, stack, table)
+
+
+def reload():
+    """Reload everything the process-wide registry has loaded"""
+    registry.reload()
+
+
+def refresh(domain=None, stack=None):
+    """Apply data file edits to the process-wide registry in place"""
+    return registry.refresh(domain, stack)
+
+
+# ============ FEDERATED INDEX ============
+class FederatedIndex:
+    """Every domain index behind one interface, used to route queries by BM25 evidence
+
+    Each domain is ranked with its own query plan (BM25.plan: merged
+    repeats, fuzzy expansions, dropped common terms), so a domain's hits
+    and scores are exactly those of searching it directly. A domain's
+    evidence is its best score divided by BM25.query_bound() of its index.
+    """
+
+    def __init__(self, corpora):
+        self.domains = list(corpora)
+        self.corpora = [corpora[domain] for domain in self.domains]
+
+    @property
+    def versions(self):
+        """Data versions of the domain indexes (edits synced in place change them)"""
+        return tuple(corpus.version for corpus in self.corpora)
+
+    def _rank(self, query, k):
+        """[(domain position, evidence, bound, top k hits)] for domains with a match, best evidence first"""
+        tokens = tokenize_query(query)
+        ranked = []
+        for pos, corpus in enumerate(self.corpora):
+            hits = corpus.bm25.top_k(query, k, "python")
+            if not hits:
+                continue
+            bound = corpus.bm25.query_bound(tokens)
+            ranked.append((pos, hits[0][1] / bound, bound, hits))
+        # Stable sort: equal evidence keeps CSV_CONFIG order
+        ranked.sort(key=lambda entry: -entry[1])
+        return ranked
+
+    def route(self, query, k):
+        """[(domain, evidence, [(idx, score), ...top k])] for domains with a match, best evidence first"""
+        return [(self.domains[pos], evidence, hits) for pos, evidence, _, hits in self._rank(query, k)]
+
+    def merged(self, query, k):
+        """Top k (domain, idx, normalized score) across all domains"""
+        candidates = [(score / bound, pos, idx)
+                      for pos, _, bound, hits in self._rank(query, k) for idx, score in hits]
+        candidates.sort(key=lambda hit: (-hit[0], hit[1], hit[2]))
+        return [(self.domains[pos], idx, score) for score, pos, idx in candidates[:k]]
+
+
+# ============ SHARDED SEARCH ============
+# For offline sweeps over large corpora: each shard is a contiguous range of
+# rows indexed in its own worker process. Shards are finalized with the
+# statistics of the whole corpus, so their scores are the single-index
+# scores and a (-score, id) merge gives the single-index top k.
+_shard = None  # (BM25, first doc id) held by a shard worker process
+
+
+def _shard_init(documents, offset, k1, b, field_weights, tokenizer_config):
+    global _shard
+    tokenizer.configure("stem" in tokenizer_config, "stopwords" in tokenizer_config)
+    bm25 = BM25(k1, b, field_weights)
+    for doc in documents:
+        bm25.add_document(doc)
+    _shard = (bm25, offset)
+
+
+def _shard_stats():
+    return _shard[0].collection_stats()
+
+
+def _shard_finalize(collection):
+    bm25 = _shard[0]
+    bm25.finalize(collection)
+    return bm25.idf, bm25.max_impacts
+
+
+def _shard_top_k_batch(plans, k, backend):
+    bm25, offset = _shard
+    return [[(offset + idx, score) for idx, score in ranked] for ranked in bm25.top_k_batch(plans, k, backend)]
+
+
+class ShardedCorpus:
+    """A corpus split across worker processes, one BM25 shard per process
+
+    Queries are planned here against the idf and score bounds of the whole
+    collection (a shard only knows its own terms) and the shards score the
+    planned terms. Use as a context manager (or call close()) to stop the workers.
+    """
+
+    def __init__(self, filepath, search_cols, output_cols, shards=None, k1=1.5, b=0.75, field_weights=None):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.filepath = filepath
+        self.rows = None
+        documents = []
+        for row in _iter_csv(filepath):
+            if self.rows is None:
+                self.rows = ColumnStore([col for col in output_cols if col in row])
+            self.rows.append(row, row.get(ROW_KEY))
+            documents.append(_row_fields(row, search_cols))
+        if self.rows is None:
+            self.rows = ColumnStore([])
+
+        shards = max(1, min(shards or os.cpu_count() or 1, len(documents)))
+        size = -(-len(documents) // shards) if documents else 0
+        self._executors = [
+            ProcessPoolExecutor(1, initializer=_shard_init,
+                                initargs=(documents[start:start + size], start, k1, b, field_weights,
+                                          tokenizer.config()))
+            for start in range(0, max(len(documents), 1), max(size, 1))
+        ]
+        del documents
+
+        # Shards index in parallel; then combine their statistics
+        N, total_length, doc_freqs = 0, 0, defaultdict(int)
+        for stats in [f.result() for f in [ex.submit(_shard_stats) for ex in self._executors]]:
+            N += stats[0]
+            total_length += stats[1]
+            for word, freq in stats[2].items():
+                doc_freqs[word] += freq
+        collection = (N, total_length, dict(doc_freqs))
+        self.idf, self.max_impacts = {}, {}
+        self._term_index = None
+        for future in [ex.submit(_shard_finalize, collection) for ex in self._executors]:
+            idf, max_impacts = future.result()
+            self.idf.update(idf)
+            for word, impact in max_impacts.items():
+                if impact > self.max_impacts.get(word, 0.0):
+                    self.max_impacts[word] = impact
+
+    @property
+    def shards(self):
+        return len(self._executors)
+
+    def expand(self, token):
+        """[(term, similarity)] collection terms close to a token (see TermIndex)"""
+        if self._term_index is None:
+            self._term_index = TermIndex(self.idf)
+        return self._term_index.expand(token)
+
+    def plan(self, query):
+        """Terms to score for a query over the whole collection (see plan_query)"""
+        return plan_query(query, self.idf, self.max_impacts, self.expand)
+
+    def top_k_batch(self, queries, k, backend=None):
+        """Best k (idx, score) pairs per query, merged across shards"""
+        plans = [self.plan(query)[0] for query in queries]
+        futures = [ex.submit(_shard_top_k_batch, plans, k, backend) for ex in self._executors]
+        per_shard = [future.result() for future in futures]
+        return [sorted((hit for hits in shard_hits for hit in hits), key=lambda hit: (-hit[1], hit[0]))[:k]
+                for shard_hits in zip(*per_shard)]
+
+    def top_k(self, query, k, backend=None):
+        return self.top_k_batch([query], k, backend)[0]
+
+    def search_batch(self, queries, max_results, backend=None, columns=None):
+        """Output rows of the top results per query, like Corpus.search_batch()"""
+        return [[self.rows.materialize(idx, columns) for idx, _ in ranked]
+                for ranked in self.top_k_batch(queries, max_results, backend)]
+
+    def search(self, query, max_results, backend=None, columns=None):
+        return self.search_batch([query], max_results, backend, columns)[0]
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
+        self._executors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sharded_corpus(domain=None, stack=None, shards=None, filepath=None):
+    """Open a ShardedCorpus for a domain or stack (filepath overrides the data file,
+    e.g. a large synthetic CSV in the same schema); shards defaults to the CPU count"""
+    kind, name = ("stack", stack) if stack else ("domain", domain or "style")
+    default_path, search_cols, output_cols, field_weights = registry._spec((kind, name))
+    return ShardedCorpus(Path(filepath) if filepath else default_path, search_cols, output_cols, shards,
+                         field_weights=field_weights)
+
+
+# ============ SEARCH FUNCTIONS ============
+# Whole-word keywords per domain (a trailing plural "s" also matches); the
+# "#" entry of the color domain only matches a hex colour such as #1E293B.
+# Dict order breaks ties between domains with the same number of hits.
+DOMAIN_KEYWORDS = {
+    "color": ["color", "palette", "hex", "#", "rgb"],
+    "chart": ["chart", "graph", "visualization", "trend", "bar", "pie", "scatter", "heatmap", "funnel"],
+    "landing": ["landing", "page", "cta", "conversion", "hero", "testimonial", "pricing", "section"],
+    "product": ["saas", "ecommerce", "e-commerce", "fintech", "healthcare", "gaming", "portfolio", "crypto", "dashboard"],
+    "style": ["style", "design", "ui", "minimalism", "glassmorphism", "neumorphism", "brutalism", "dark mode", "flat", "aurora", "prompt", "css", "implementation", "variable", "checklist", "tailwind"],
+    "ux": ["ux", "usability", "accessibility", "wcag", "touch", "scroll", "animation", "keyboard", "navigation", "mobile"],
+    "typography": ["font", "typography", "heading", "serif", "sans"],
+    "icons": ["icon", "lucide", "heroicons", "symbol", "glyph", "pictogram", "svg icon"],
+    "react": ["react", "next.js", "nextjs", "suspense", "memo", "usecallback", "useeffect", "rerender", "bundle", "waterfall", "barrel", "dynamic import", "rsc", "server component"],
+    "web": ["aria", "focus", "outline", "semantic", "virtualize", "autocomplete", "form", "input type", "preconnect"]
+}
+
+_KEYWORD_DOMAINS = {kw: domain for domain, keywords in DOMAIN_KEYWORDS.items() for kw in keywords if kw != "#"}
+# One alternation, longest keyword first so "svg icon" wins over "icon"
+_DOMAIN_PATTERN = re.compile(
+    r"(?P<hex>#(?:[0-9a-f]{8}|[0-9a-f]{6}|[0-9a-f]{3,4})(?!\w))"
+    r"|(?<!\w)(?P<kw>" + "|".join(re.escape(kw) for kw in sorted(_KEYWORD_DOMAINS, key=len, reverse=True)) + r")s?(?!\w)"
+)
+
+
+def _domain_keyword_hits(query):
+    """{domain: number of distinct domain keywords in query}, in DOMAIN_KEYWORDS order"""
+    matched = set()
+    for match in _DOMAIN_PATTERN.finditer(query.lower()):
+        matched.add(match.group("kw") or "#")
+    hits = dict.fromkeys(DOMAIN_KEYWORDS, 0)
+    for keyword in matched:
+        hits["color" if keyword == "#" else _KEYWORD_DOMAINS[keyword]] += 1
+    return hits
+
+
+def detect_domains(query):
+    """Domains whose keywords appear in query, as [(domain, confidence)] best first
+
+    Confidence is the domain's share of all keyword hits in the query; ties
+    keep DOMAIN_KEYWORDS order. Empty when no keyword matches.
+    """
+    hits = _domain_keyword_hits(query)
+    total = sum(hits.values())
+    ranked = sorted((domain for domain in hits if hits[domain]), key=lambda domain: -hits[domain])
+    return [(domain, hits[domain] / total) for domain in ranked]
 
 
 def detect_domain(query):
     """Auto-detect the most relevant domain from query"""
-    query_lower = query.lower()
-
-    domain_keywords = {
-        "color": ["color", "palette", "hex", "#", "rgb"],
-        "chart": ["chart", "graph", "visualization", "trend", "bar", "pie", "scatter", "heatmap", "funnel"],
-        "landing": ["landing", "page", "cta", "conversion", "hero", "testimonial", "pricing", "section"],
-        "product": ["saas", "ecommerce", "e-commerce", "fintech", "healthcare", "gaming", "portfolio", "crypto", "dashboard"],
-        "style": ["style", "design", "ui", "minimalism", "glassmorphism", "neumorphism", "brutalism", "dark mode", "flat", "aurora", "prompt", "css", "implementation", "variable", "checklist", "tailwind"],
-        "ux": ["ux", "usability", "accessibility", "wcag", "touch", "scroll", "animation", "keyboard", "navigation", "mobile"],
-        "typography": ["font", "typography", "heading", "serif", "sans"],
-        "icons": ["icon", "icons", "lucide", "heroicons", "symbol", "glyph", "pictogram", "svg icon"],
-        "react": ["react", "next.js", "nextjs", "suspense", "memo", "usecallback", "useeffect", "rerender", "bundle", "waterfall", "barrel", "dynamic import", "rsc", "server component"],
-        "web": ["aria", "focus", "outline", "semantic", "virtualize", "autocomplete", "form", "input type", "preconnect"]
+    ranked = detect_domains(query)
+    return ranked[0][0] if ranked else "style"
+
+
+def _query_key(query):
+    """Result cache key part for a query: its tokens, the tokenizer options, the index format and
+    the query planner settings that ranked them"""
+    planner = (FUZZY_ENABLED, FUZZY_MIN_LENGTH, FUZZY_LONG_TOKEN, FUZZY_MAX_EXPANSIONS, QUERY_MIN_IDF, QUERY_MAX_TERMS)
+    return tokenize_query(query), tokenizer.config(), INDEX_CACHE_VERSION, planner
+
+
+def _federated_versions(domains=None):
+    """Current data versions of the domains (default: all) in the federated index"""
+    return tuple(_file_digest(DATA_DIR / CSV_CONFIG[domain]["file"]) for domain in domains or CSV_CONFIG
+                 if (DATA_DIR / CSV_CONFIG[domain]["file"]).exists())
+
+
+def _cached_route(query, max_results, domains):
+    """{domain: (evidence, output rows)} from FederatedIndex.route() over some domains, through the result cache"""
+    cache_key = ("federated", "route", tuple(domains)) + _query_key(query) + (max_results,)
+    # Cached flat as rows: a {"_domain", "_evidence"} marker, then that domain's results
+    flat = result_cache.get(cache_key + (_federated_versions(domains),))
+    if flat is None:
+        federated = registry.federated(domains)
+        flat = []
+        for domain, evidence, hits in federated.route(query, max_results):
+            rows = federated.corpora[federated.domains.index(domain)].rows
+            flat.append({"_domain": domain, "_evidence": evidence})
+            flat.extend(rows.materialize(idx) for idx, _ in hits)
+        result_cache.put(cache_key + (federated.versions,), flat)
+
+    routed = {}
+    for row in flat:
+        if "_domain" in row:
+            results = []
+            routed[row["_domain"]] = (row["_evidence"], results)
+        else:
+            results.append(row)
+    return routed
+
+
+def _route(query, max_results):
+    """(domain, results) for a query without a domain, ranked over every domain (see FederatedIndex)
+
+    Domains are ranked by their normalized BM25 evidence, with the number of
+    domain keywords the query names (detect_domain's table) taking
+    precedence, so "font pairing" still goes to typography. With neither,
+    the query falls back to "style" like detect_domain(). Only the domains
+    tied on keywords are scored (and loaded): when one domain has the most
+    keywords, the query is simply searched there.
+    """
+    keyword_hits = _domain_keyword_hits(query)
+    most = max(keyword_hits.values())
+    candidates = [domain for domain in keyword_hits if keyword_hits[domain] == most]
+    if len(candidates) == 1:
+        domain = candidates[0]
+        filepath = DATA_DIR / CSV_CONFIG[domain]["file"]
+        return domain, _cached_search(("domain", domain), filepath, query, max_results) if filepath.exists() else []
+
+    routed = _cached_route(query, max_results, candidates)
+    best = max(candidates, key=lambda domain: routed.get(domain, (0,))[0])
+    if best not in routed and most == 0:
+        best = "style"
+    return best, routed[best][1] if best in routed else []
+
+
+def _search_all(query, max_results):
+    """Result dict for domain="all": score-normalized hits merged across every domain"""
+    cache_key = ("federated", "all") + _query_key(query) + (max_results,)
+    results = result_cache.get(cache_key + (_federated_versions(),))
+    if results is None:
+        federated = registry.federated()
+        results = []
+        for domain, idx, _ in federated.merged(query, max_results):
+            row = {"Domain": domain}
+            row.update(federated.corpora[federated.domains.index(domain)].rows.materialize(idx))
+            results.append(row)
+        result_cache.put(cache_key + (federated.versions,), results)
+    files = []
+    for row in results:
+        if CSV_CONFIG[row["Domain"]]["file"] not in files:
+            files.append(CSV_CONFIG[row["Domain"]]["file"])
+    return {
+        "domain": "all",
+        "query": query,
+        "file": ", ".join(files),
+        "count": len(results),
+        "results": results
+    }
+
+
+def _domain_result(domain, query, config, results):
+    """Result dict returned by search()"""
+    return {
+        "domain": domain,
+        "query": query,
+        "file": config["file"],
+        "count": len(results),
+        "results": results
+    }
+
+
+def _stack_result(stack, query, results):
+    """Result dict returned by search_stack()"""
+    return {
+        "domain": "stack",
+        "stack": stack,
+        "query": query,
+        "file": STACK_CONFIG[stack]["file"],
+        "count": len(results),
+        "results": results
     }
 
-    scores = {domain: sum(1 for kw in keywords if kw in query_lower) for domain, keywords in domain_keywords.items()}
-    best = max(scores, key=scores.get)
-    return best if scores[best] > 0 else "style"
+
+def _search_cache_key(key, query, max_results):
+    """Result cache key of a registry corpus search, without the data version"""
+    kind, name = key
+    return (kind, name) + _query_key(query) + (max_results,)
+
+
+def _cache_lookup(key, filepath, query, max_results):
+    """(cache key, cached results or None) for searching one registry corpus"""
+    cache_key = _search_cache_key(key, query, max_results)
+    return cache_key, result_cache.get(cache_key + (_file_digest(filepath),))
+
+
+def _search_and_cache(key, cache_key, query, max_results, backend=None):
+    """Search one registry corpus and store the results under a _cache_lookup() key"""
+    corpus = registry._get(key)
+    results = corpus.search(query, max_results, backend)
+    # Keyed by the version the index was built from, which may lag the file until reload()
+    result_cache.put(cache_key + (corpus.version,), results)
+    return results
+
+
+def _cached_search(key, filepath, query, max_results, backend=None):
+    """Search one registry corpus through the result cache"""
+    cache_key, results = _cache_lookup(key, filepath, query, max_results)
+    if results is None:
+        results = _search_and_cache(key, cache_key, query, max_results, backend)
+    return results
+
+
+def _cached_search_batch(key, filepath, queries, max_results, backend=None):
+    """_cached_search() for many queries; only the misses are scored, as one batch"""
+    version = _file_digest(filepath)
+    cache_keys = [_search_cache_key(key, query, max_results) for query in queries]
+    output = [result_cache.get(cache_key + (version,)) for cache_key in cache_keys]
+    missing = [pos for pos, results in enumerate(output) if results is None]
+    if missing:
+        corpus = registry._get(key)
+        batch = corpus.search_batch([queries[pos] for pos in missing], max_results, backend)
+        for pos, results in zip(missing, batch):
+            result_cache.put(cache_keys[pos] + (corpus.version,), results)
+            output[pos] = results
+    return output
 
 
-def search(query, domain=None, max_results=MAX_RESULTS):
-    """Main search function with auto-domain detection"""
+def search(query, domain=None, max_results=MAX_RESULTS, backend=None):
+    """Main search function with auto-domain routing (domain="all" merges every domain)
+
+    Without a domain, the query is scored against every domain at once and
+    answered from the best-matching one (see _route); the federated pass
+    always uses the python backend.
+    """
+    if domain == "all":
+        return _search_all(query, max_results)
     if domain is None:
-        domain = detect_domain(query)
+        domain, results = _route(query, max_results)
+        if (DATA_DIR / CSV_CONFIG[domain]["file"]).exists():
+            return _domain_result(domain, query, CSV_CONFIG[domain], results)
 
-    config = CSV_CONFIG.get(domain, CSV_CONFIG["style"])
+    config_domain = domain if domain in CSV_CONFIG else "style"
+    config = CSV_CONFIG[config_domain]
     filepath = DATA_DIR / config["file"]
 
     if not filepath.exists():
         return {"error": f"File not found: {filepath}", "domain": domain}
 
-    results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results)
+    results = _cached_search(("domain", config_domain), filepath, query, max_results, backend)
+    return _domain_result(domain, query, config, results)
+
+
+def search_domains(requests, backend=None, preload=()):
+    """search() for several (query, domain, max_results) requests at once
+
+    Each distinct query is tokenized once and answered from the result
+    cache where possible. Indexes that are not loaded yet (plus the
+    domains named in preload, for a follow-up search that depends on these
+    results) are loaded in parallel worker threads, so a cold call pays for
+    the slowest index rather than the sum. Scoring then runs in this thread:
+    it is pure Python, so threads would only add overhead once indexes are
+    warm. Results equal [search(query, domain, max_results, backend) for ...];
+    requests without a single domain are routed as usual.
+    """
+    requests = [tuple(request) for request in requests]
+    output = [None] * len(requests)
+    misses = []
+    for pos, (query, domain, max_results) in enumerate(requests):
+        tokenize_query(query)
+        if domain is None or domain == "all":
+            continue
+        name = domain if domain in CSV_CONFIG else "style"
+        filepath = DATA_DIR / CSV_CONFIG[name]["file"]
+        if not filepath.exists():
+            continue
+        cache_key, results = _cache_lookup(("domain", name), filepath, query, max_results)
+        if results is None:
+            misses.append((pos, name, cache_key))
+        else:
+            output[pos] = _domain_result(domain, query, CSV_CONFIG[name], results)
+
+    cold = [name for name in dict.fromkeys([name for _, name, _ in misses] + list(preload))
+            if name in CSV_CONFIG and ("domain", name) not in registry._corpora
+            and (DATA_DIR / CSV_CONFIG[name]["file"]).exists()]
+    if len(cold) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(cold)) as pool:
+            list(pool.map(registry._get, [("domain", name) for name in cold]))
+
+    for pos, name, cache_key in misses:
+        query, domain, max_results = requests[pos]
+        results = _search_and_cache(("domain", name), cache_key, query, max_results, backend)
+        output[pos] = _domain_result(domain, query, CSV_CONFIG[name], results)
+
+    return [result if result is not None else search(query, domain, max_results, backend)
+            for result, (query, domain, max_results) in zip(output, requests)]
+
+
+def _selected_stacks(stack):
+    """Stack names for "all", a list or a comma-separated string; None for a single stack"""
+    if stack == "all":
+        return list(AVAILABLE_STACKS)
+    if isinstance(stack, (list, tuple)):
+        return list(stack)
+    if isinstance(stack, str) and "," in stack:
+        return [name.strip() for name in stack.split(",") if name.strip()]
+    return None
+
 
+def _search_stacks(query, stacks, max_results, backend=None):
+    """Result dict for several stacks: score-normalized hits merged across them
+
+    Each stack is loaded and scored in its own worker thread, so indexes
+    that are not loaded yet load in parallel (like search_domains); scores
+    are divided by the stack's BM25.query_bound() so they compare across
+    files of different size and vocabulary.
+    """
+    unknown = [stack for stack in stacks if stack not in STACK_CONFIG]
+    if unknown or not stacks:
+        return {"error": f"Unknown stack: {', '.join(unknown)}. Available: {', '.join(AVAILABLE_STACKS)}"}
+    stacks = [stack for stack in dict.fromkeys(stacks) if (DATA_DIR / STACK_CONFIG[stack]["file"]).exists()]
+    label = ",".join(stacks)
+
+    cache_key = ("stacks", label) + _query_key(query) + (max_results,)
+    versions = tuple(_file_digest(DATA_DIR / STACK_CONFIG[stack]["file"]) for stack in stacks)
+    results = result_cache.get(cache_key + (versions,))
+    if results is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        tokens = tokenize_query(query)
+        corpora = [None] * len(stacks)
+
+        def score(pos):
+            corpora[pos] = registry.get_stack(stacks[pos])
+            bm25 = corpora[pos].bm25
+            bound = bm25.query_bound(tokens)
+            return [(score / bound, pos, idx) for idx, score in bm25.top_k(query, max_results, backend)]
+
+        with ThreadPoolExecutor(max_workers=len(stacks) or 1) as pool:
+            candidates = [hit for hits in pool.map(score, range(len(stacks))) for hit in hits]
+        candidates.sort(key=lambda hit: (-hit[0], hit[1], hit[2]))
+
+        results = []
+        for _, pos, idx in candidates[:max_results]:
+            row = {"Stack": stacks[pos]}
+            row.update(corpora[pos].rows.materialize(idx))
+            results.append(row)
+        result_cache.put(cache_key + (tuple(corpus.version for corpus in corpora),), results)
+
+    files = []
+    for row in results:
+        if STACK_CONFIG[row["Stack"]]["file"] not in files:
+            files.append(STACK_CONFIG[row["Stack"]]["file"])
     return {
-        "domain": domain,
+        "domain": "stack",
+        "stack": label,
         "query": query,
-        "file": config["file"],
+        "file": ", ".join(files),
         "count": len(results),
         "results": results
     }
 
 
-def search_stack(query, stack, max_results=MAX_RESULTS):
-    """Search stack-specific guidelines"""
+def search_stack(query, stack, max_results=MAX_RESULTS, backend=None):
+    """Search stack-specific guidelines (stack="all", a list or "a,b" merges several stacks)"""
+    stacks = _selected_stacks(stack)
+    if stacks is not None:
+        return _search_stacks(query, stacks, max_results, backend)
+
     if stack not in STACK_CONFIG:
         return {"error": f"Unknown stack: {stack}. Available: {', '.join(AVAILABLE_STACKS)}"}
 
@@ -241,13 +1941,59 @@ def search_stack(query, stack, max_results=MAX_RESULTS):
     if not filepath.exists():
         return {"error": f"Stack file not found: {filepath}", "stack": stack}
 
-    results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results)
+    results = _cached_search(("stack", stack), filepath, query, max_results, backend)
+    return _stack_result(stack, query, results)
 
-    return {
-        "domain": "stack",
-        "stack": stack,
-        "query": query,
-        "file": STACK_CONFIG[stack]["file"],
-        "count": len(results),
-        "results": results
-    }
+
+def search_many(queries, domain=None, stack=None, max_results=MAX_RESULTS, backend=None):
+    """Run many queries against warm indexes, returning one search()/search_stack() dict per query
+
+    With a domain (or stack) the queries are scored together through
+    Corpus.search_batch, so the index is loaded once and the numpy backend
+    can batch them; without one each query is routed on its own.
+    """
+    queries = list(queries)
+    if _selected_stacks(stack) is not None:
+        return [search_stack(query, stack, max_results, backend) for query in queries]
+    if stack is not None:
+        filepath = DATA_DIR / STACK_CONFIG[stack]["file"] if stack in STACK_CONFIG else None
+        if filepath is None or not filepath.exists():
+            return [search_stack(query, stack, max_results, backend) for query in queries]
+        batch = _cached_search_batch(("stack", stack), filepath, queries, max_results, backend)
+        return [_stack_result(stack, query, results) for query, results in zip(queries, batch)]
+
+    if domain is None or domain == "all":
+        # Routed per query through the federated index
+        return [search(query, domain, max_results, backend) for query in queries]
+
+    config = CSV_CONFIG[domain if domain in CSV_CONFIG else "style"]
+    filepath = DATA_DIR / config["file"]
+    if not filepath.exists():
+        return [search(query, domain, max_results, backend) for query in queries]
+    batch = _cached_search_batch(("domain", domain if domain in CSV_CONFIG else "style"), filepath,
+                                 queries, max_results, backend)
+    return [_domain_result(domain, query, config, results) for query, results in zip(queries, batch)]
+
+
+def explain_plan(query, domain=None, stack=None):
+    """BM25.explain() for each index a search would score the query against
+
+    Returns a list of plans, each labelled with its "domain" or "stack";
+    without a domain or stack, the domain the query routes to.
+    """
+    stacks = _selected_stacks(stack) or ([stack] if stack else None)
+    if stacks:
+        keys = [("stack", name) for name in stacks if name in STACK_CONFIG]
+    elif domain == "all":
+        keys = [("domain", name) for name in CSV_CONFIG]
+    else:
+        name = domain if domain in CSV_CONFIG else "style" if domain else _route(query, 1)[0]
+        keys = [("domain", name)]
+
+    plans = []
+    for kind, name in keys:
+        if not registry._spec((kind, name))[0].exists():
+            continue
+        plan = registry._get((kind, name)).bm25.explain(query)
+        plans.append(dict({"stack" if kind == "stack" else "domain": name}, **plan))
+    return plans
@@ -7,18 +7,26 @@ to generate comprehensive design system recommendations.
 Usage:
     from design_system import generate_design_system
     result = generate_design_system("SaaS dashboard", "My Project")
+
+    # Many projects at once, in worker processes
+    results = generate_design_systems([{"query": "SaaS dashboard", "project_name": "Acme", "pages": ["checkout"]}])
+
+    # Write already generated design systems in one pass, reporting which files changed
+    report = persist_design_systems([{"design_system": design_system, "pages": ["checkout"]}])
     
     # With persistence (Master + Overrides pattern)
     result = generate_design_system("SaaS dashboard", "My Project", persist=True)
     result = generate_design_system("SaaS dashboard", "My Project", persist=True, page="dashboard")
 """
 
-import csv
 import json
 import os
+import re
 from datetime import datetime
 from pathlib import Path
-from core import search, DATA_DIR
+import tokenizer
+from core import (CACHE_DIR, CACHE_ENABLED, CSV_CONFIG, DATA_DIR, FUZZY_ENABLED, DiskStore, _file_digest, registry,
+                  search, search_domains)
 
 
 # ============ CONFIGURATION ============
@@ -32,92 +40,123 @@ SEARCH_CONFIG = {
     "typography": {"max_results": 2}
 }
 
+# On-disk memo of generated design systems and rendered outputs (CACHE_DIR/design-systems);
+# bump the version when the cached values change shape
+DESIGN_CACHE_VERSION = 1
+DESIGN_CACHE_SIZE = int(os.environ.get("UI_PRO_MAX_DESIGN_CACHE_SIZE") or 512)
 
-# ============ DESIGN SYSTEM GENERATOR ============
-class DesignSystemGenerator:
-    """Generates design system recommendations from aggregated searches."""
+# "Generated:" timestamp line of MASTER.md and page files
+GENERATED_LINE = re.compile(r"^(>? ?\*\*Generated:\*\* ).*$", re.MULTILINE)
 
-    def __init__(self):
-        self.reasoning_data = self._load_reasoning()
 
-    def _load_reasoning(self) -> list:
-        """Load reasoning rules from CSV."""
-        filepath = DATA_DIR / REASONING_FILE
-        if not filepath.exists():
-            return []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
-
-    def _multi_domain_search(self, query: str, style_priority: list = None) -> dict:
-        """Execute searches across multiple domains."""
-        results = {}
-        for domain, config in SEARCH_CONFIG.items():
-            if domain == "style" and style_priority:
-                # For style, also search with priority keywords
-                priority_query = " ".join(style_priority[:2]) if style_priority else query
-                combined_query = f"{query} {priority_query}"
-                results[domain] = search(combined_query, domain, config["max_results"])
-            else:
-                results[domain] = search(query, domain, config["max_results"])
-        return results
+# ============ REASONING RULES ============
+class ReasoningIndex:
+    """Precompiled lookup of reasoning rules by product category.
 
-    def _find_reasoning_rule(self, category: str) -> dict:
-        """Find matching reasoning rule for a category."""
+    Resolves a category like three scans over the table would: the first
+    rule whose UI_Category equals it, else the first whose name contains it
+    or is contained in it, else the first with a name keyword inside it.
+    Names and keywords map to their first row, and only the substrings of
+    the category (or the rows sharing all its trigrams) are looked up, so
+    a lookup does not grow with the table. Decision_Rules JSON and the
+    style priorities are parsed once.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.names = {}
+        self.keywords = {}
+        self.grams = {}
+        self.decision_rules = []
+        self.style_priority = []
+        for idx, rule in enumerate(rules):
+            name = (rule.get("UI_Category") or "").lower()
+            self.names.setdefault(name, idx)
+            for keyword in name.replace("/", " ").replace("-", " ").split():
+                self.keywords.setdefault(keyword, idx)
+            for gram in self._trigrams(name):
+                self.grams.setdefault(gram, set()).add(idx)
+
+            decision_rules = {}
+            try:
+                decision_rules = json.loads(rule.get("Decision_Rules") or "{}")
+            except json.JSONDecodeError:
+                pass
+            self.decision_rules.append(decision_rules)
+            self.style_priority.append([s.strip() for s in (rule.get("Style_Priority") or "").split("+")])
+        self.max_name = max(map(len, self.names), default=0)
+        self.max_keyword = max(map(len, self.keywords), default=0)
+        self._memo = {}
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def _first_substring_match(text: str, table: dict, max_len: int):
+        """Lowest row index among the substrings of text found in table."""
+        best = None
+        for start in range(len(text)):
+            for end in range(start + 1, min(len(text), start + max_len) + 1):
+                idx = table.get(text[start:end])
+                if idx is not None and (best is None or idx < best):
+                    best = idx
+        return best
+
+    def find(self, category: str):
+        """Row index of the rule for a category, or None."""
         category_lower = category.lower()
+        if category_lower in self._memo:
+            return self._memo[category_lower]
+
+        # Exact name
+        found = self.names.get(category_lower)
+        if found is None:
+            # Partial: a name inside the category ("" is inside everything) ...
+            candidates = [self._first_substring_match(category_lower, self.names, self.max_name),
+                          self.names.get("")]
+            # ... or the category inside a name: only rows sharing all its trigrams can qualify
+            if len(category_lower) >= 3:
+                rows = set.intersection(*(self.grams.get(gram, set()) for gram in self._trigrams(category_lower)))
+            else:
+                rows = range(len(self.rules))
+            candidates.extend(idx for idx in rows
+                              if category_lower in (self.rules[idx].get("UI_Category") or "").lower())
+            candidates = [idx for idx in candidates if idx is not None]
+            found = min(candidates) if candidates else None
+        if found is None:
+            # Keyword: any word of a name inside the category
+            found = self._first_substring_match(category_lower, self.keywords, self.max_keyword)
 
-        # Try exact match first
-        for rule in self.reasoning_data:
-            if rule.get("UI_Category", "").lower() == category_lower:
-                return rule
+        self._memo[category_lower] = found
+        return found
 
-        # Try partial match
-        for rule in self.reasoning_data:
-            ui_cat = rule.get("UI_Category", "").lower()
-            if ui_cat in category_lower or category_lower in ui_cat:
-                return rule
 
-        # Try keyword match
-        for rule in self.reasoning_data:
-            ui_cat = rule.get("UI_Category", "").lower()
-            keywords = ui_cat.replace("/", " ").replace("-", " ").split()
-            if any(kw in category_lower for kw in keywords):
-                return rule
+_reasoning_index = None
 
-        return {}
 
-    def _apply_reasoning(self, category: str, search_results: dict) -> dict:
-        """Apply reasoning rules to search results."""
-        rule = self._find_reasoning_rule(category)
+def reasoning_index() -> ReasoningIndex:
+    """ReasoningIndex of the reasoning table, rebuilt when the table is reloaded."""
+    global _reasoning_index
+    rules = registry.table(REASONING_FILE)
+    if _reasoning_index is None or _reasoning_index.rules is not rules:
+        _reasoning_index = ReasoningIndex(rules)
+    return _reasoning_index
 
-        if not rule:
-            return {
-                "pattern": "Hero + Features + CTA",
-                "style_priority": ["Minimalism", "Flat Design"],
-                "color_mood": "Professional",
-                "typography_mood": "Clean",
-                "key_effects": "Subtle hover transitions",
-                "anti_patterns": "",
-                "decision_rules": {},
-                "severity": "MEDIUM"
-            }
 
-        # Parse decision rules JSON
-        decision_rules = {}
-        try:
-            decision_rules = json.loads(rule.get("Decision_Rules", "{}"))
-        except json.JSONDecodeError:
-            pass
+# ============ DESIGN SYSTEM GENERATOR ============
+class DesignSystemGenerator:
+    """Generates design system recommendations from aggregated searches."""
 
-        return {
-            "pattern": rule.get("Recommended_Pattern", ""),
-            "style_priority": [s.strip() for s in rule.get("Style_Priority", "").split("+")],
-            "color_mood": rule.get("Color_Mood", ""),
-            "typography_mood": rule.get("Typography_Mood", ""),
-            "key_effects": rule.get("Key_Effects", ""),
-            "anti_patterns": rule.get("Anti_Patterns", ""),
-            "decision_rules": decision_rules,
-            "severity": rule.get("Severity", "MEDIUM")
-        }
+    def __init__(self):
+        self.reasoning = reasoning_index()
+        self.reasoning_data = self.reasoning.rules
+
+    def _style_query(self, query: str, style_priority: list = None) -> str:
+        """Style search query: the query plus its first two priority keywords."""
+        if not style_priority:
+            return query
+        return f"{query} {' '.join(style_priority[:2])}"
 
     def _select_best_match(self, results: list, priority_keywords: list) -> dict:
         """Select best matching result based on priority keywords."""
@@ -156,14 +195,53 @@ class DesignSystemGenerator:
         scored.sort(key=lambda x: x[0], reverse=True)
         return scored[0][1] if scored and scored[0][0] > 0 else results[0]
 
+    def _find_reasoning_rule(self, category: str) -> tuple:
+        """Find matching reasoning rule for a category (exact, then partial, then keyword match).
+
+        Returns (index, rule), or (None, {}) when no rule matches.
+        """
+        idx = self.reasoning.find(category)
+        return idx, self.reasoning_data[idx] if idx is not None else {}
+
+    def _apply_reasoning(self, category: str, search_results: dict) -> dict:
+        """Apply reasoning rules to search results."""
+        idx, rule = self._find_reasoning_rule(category)
+
+        if not rule:
+            return {
+                "pattern": "Hero + Features + CTA",
+                "style_priority": ["Minimalism", "Flat Design"],
+                "color_mood": "Professional",
+                "typography_mood": "Clean",
+                "key_effects": "Subtle hover transitions",
+                "anti_patterns": "",
+                "decision_rules": {},
+                "severity": "MEDIUM"
+            }
+
+        return {
+            "pattern": rule.get("Recommended_Pattern", ""),
+            "style_priority": list(self.reasoning.style_priority[idx]),
+            "color_mood": rule.get("Color_Mood", ""),
+            "typography_mood": rule.get("Typography_Mood", ""),
+            "key_effects": rule.get("Key_Effects", ""),
+            "anti_patterns": rule.get("Anti_Patterns", ""),
+            "decision_rules": dict(self.reasoning.decision_rules[idx]),
+            "severity": rule.get("Severity", "MEDIUM")
+        }
+
     def _extract_results(self, search_result: dict) -> list:
         """Extract results list from search result dict."""
         return search_result.get("results", [])
 
     def generate(self, query: str, project_name: str = None) -> dict:
         """Generate complete design system recommendation."""
-        # Step 1: First search product to get category
-        product_result = search(query, "product", 1)
+        # Step 1: Search product to get the category; the domains that do not
+        # depend on it are searched at the same time (and the style index loaded)
+        independent = [domain for domain in SEARCH_CONFIG if domain != "style"]
+        search_results = dict(zip(independent, search_domains(
+            [(query, domain, SEARCH_CONFIG[domain]["max_results"]) for domain in independent], preload=["style"])))
+        product_result = search_results["product"]
         product_results = product_result.get("results", [])
         category = "General"
         if product_results:
@@ -173,9 +251,9 @@ class DesignSystemGenerator:
         reasoning = self._apply_reasoning(category, {})
         style_priority = reasoning.get("style_priority", [])
 
-        # Step 3: Multi-domain search with style priority hints
-        search_results = self._multi_domain_search(query, style_priority)
-        search_results["product"] = product_result  # Reuse product search
+        # Step 3: Style search with style priority hints
+        search_results["style"] = search(self._style_query(query, style_priority), "style",
+                                         SEARCH_CONFIG["style"]["max_results"])
 
         # Step 4: Select best matches from each domain using priority
         style_results = self._extract_results(search_results.get("style", {}))
@@ -183,7 +261,7 @@ class DesignSystemGenerator:
         typography_results = self._extract_results(search_results.get("typography", {}))
         landing_results = self._extract_results(search_results.get("landing", {}))
 
-        best_style = self._select_best_match(style_results, reasoning.get("style_priority", []))
+        best_style = self._select_best_match(style_results, style_priority)
         best_color = color_results[0] if color_results else {}
         best_typography = typography_results[0] if typography_results else {}
         best_landing = landing_results[0] if landing_results else {}
@@ -458,9 +536,77 @@ def format_markdown(design_system: dict) -> str:
     return "\n".join(lines)
 
 
+# ============ DESIGN SYSTEM CACHE ============
+class DesignSystemCache(DiskStore):
+    """Content-addressed on-disk memo of design systems and their renders.
+
+    Keys carry the versions (content hashes) of the data files and of the
+    generator code, so an edited CSV or an upgrade simply stops matching
+    old entries, which the store then evicts least recently used first.
+    """
+
+    def __init__(self, maxsize: int = DESIGN_CACHE_SIZE, directory: str = None):
+        super().__init__(directory or CACHE_DIR / "design-systems", maxsize)
+
+    def key(self, *parts) -> tuple:
+        """Cache key: parts plus the code, data and tokenizer versions they depend on."""
+        scripts_dir = Path(__file__).parent
+        files = [DATA_DIR / CSV_CONFIG[domain]["file"] for domain in list(SEARCH_CONFIG) + ["ux"]]
+        files += [DATA_DIR / REASONING_FILE] + [scripts_dir / name for name in ("design_system.py", "core.py", "tokenizer.py")]
+        versions = tuple(self._version(path) for path in files)
+        return (DESIGN_CACHE_VERSION, versions, tokenizer.config(), FUZZY_ENABLED) + parts
+
+    @staticmethod
+    def _version(path: Path) -> str:
+        """Content hash of a file, or "missing" (generation carries on without a missing data file)."""
+        try:
+            return _file_digest(path)
+        except OSError:
+            return "missing"
+
+
+design_cache = DesignSystemCache()
+
+
+def _use_cache(cache: bool = None) -> bool:
+    """cache=None means the default: on unless UI_PRO_MAX_NO_CACHE is set."""
+    return CACHE_ENABLED if cache is None else bool(cache)
+
+
+def _generate(query: str, project_name: str = None, cache: bool = None) -> dict:
+    """DesignSystemGenerator().generate(), memoized by query tokens and project name."""
+    if not _use_cache(cache):
+        return DesignSystemGenerator().generate(query, project_name)
+    # Searches only see the query's tokens; the raw query only names the project
+    key = design_cache.key("generate", tokenizer.tokenize_query(query), project_name or query.upper())
+    design_system = design_cache.get(key)
+    if design_system is None:
+        design_system = DesignSystemGenerator().generate(query, project_name)
+        design_cache.put(key, design_system)
+    return design_system
+
+
+def _render(kind: str, design_system: dict, *args, cache: bool = None) -> str:
+    """Render a design system ("ascii", "markdown", "master" or "page"), memoized by its content."""
+    renderer = {"ascii": format_ascii_box, "markdown": format_markdown,
+                "master": format_master_md, "page": format_page_override_md}[kind]
+    if not _use_cache(cache):
+        return renderer(design_system, *args)
+    key = design_cache.key("render", kind, json.dumps(design_system, sort_keys=True), args)
+    text = design_cache.get(key)
+    if text is None:
+        text = renderer(design_system, *args)
+        design_cache.put(key, text)
+    elif kind in ("master", "page"):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        text = GENERATED_LINE.sub(lambda match: match.group(1) + timestamp, text, count=1)
+    return text
+
+
 # ============ MAIN ENTRY POINT ============
 def generate_design_system(query: str, project_name: str = None, output_format: str = "ascii", 
-                           persist: bool = False, page: str = None, output_dir: str = None) -> str:
+                           persist: bool = False, page: str = None, output_dir: str = None,
+                           cache: bool = None) -> str:
     """
     Main entry point for design system generation.
 
@@ -471,71 +617,258 @@ def generate_design_system(query: str, project_name: str = None, output_format:
         persist: If True, save design system to design-system/ folder
         page: Optional page name for page-specific override file
         output_dir: Optional output directory (defaults to current working directory)
+        cache: Reuse (and store) memoized results from the on-disk design-system cache
+               (default: on unless UI_PRO_MAX_NO_CACHE is set)
 
     Returns:
         Formatted design system string
     """
-    generator = DesignSystemGenerator()
-    design_system = generator.generate(query, project_name)
+    design_system = _generate(query, project_name, cache)
     
     # Persist to files if requested
     if persist:
-        persist_design_system(design_system, page, output_dir, query)
+        persist_design_system(design_system, page, output_dir, query, cache)
+
+    return _render("markdown" if output_format == "markdown" else "ascii", design_system, cache=cache)
+
+
+# ============ BATCH GENERATION ============
+def _manifest_entry(entry) -> dict:
+    """Normalize one manifest entry to {"query", "project_name", "pages"} (raises ValueError)."""
+    if isinstance(entry, str):
+        entry = {"query": entry}
+    if not isinstance(entry, dict) or not isinstance(entry.get("query"), str) or not entry["query"].strip():
+        raise ValueError('each manifest entry needs a "query" string')
+    pages = entry.get("pages", entry.get("page")) or []
+    if isinstance(pages, str):
+        pages = [pages]
+    if not isinstance(pages, list) or not all(isinstance(page, str) for page in pages):
+        raise ValueError('"pages" must be a list of page names')
+    return {"query": entry["query"], "project_name": entry.get("project_name"), "pages": pages}
+
+
+def _batch_init():
+    """Worker initializer: load the design-system indexes (from the compiled index cache)."""
+    for domain in list(SEARCH_CONFIG) + ["ux"]:
+        # A missing data file only leaves that domain's results empty, as in search()
+        if (DATA_DIR / CSV_CONFIG[domain]["file"]).exists():
+            registry.get(domain)
+    reasoning_index()
+
+
+def _generate_entry(entry: dict, output_dir: str = None, cache: bool = None) -> tuple:
+    """Generate and render one manifest entry: (project_name, files plan or None, error or None)."""
+    try:
+        design_system = _generate(entry["query"], entry["project_name"], cache)
+        plan = _plan_design_system(design_system, entry["pages"], output_dir, entry["query"], cache)
+    except Exception as e:
+        return entry["project_name"], None, str(e)
+    return design_system["project_name"], plan, None
+
+
+def generate_design_systems(manifest: list, output_dir: str = None, workers: int = None, cache: bool = None) -> list:
+    """
+    Generate and persist design systems for many projects in worker processes.
 
-    if output_format == "markdown":
-        return format_markdown(design_system)
-    return format_ascii_box(design_system)
+    Workers generate and render; the files are then written in one pass
+    through the change-aware, atomic persistence (see persist_design_system).
+
+    Args:
+        manifest: Entries like {"query": "SaaS dashboard", "project_name": "Acme", "pages": ["checkout"]}
+                  (project_name and pages are optional; a plain string is a query). Two entries
+                  whose projects share a folder are rejected with ValueError, like malformed ones
+        output_dir: Output directory for the design-system/ folders (defaults to current working directory)
+        workers: Worker processes (default: CPU count; 1 runs in this process)
+        cache: Use the on-disk design-system cache (see generate_design_system)
+
+    Returns:
+        One persist_design_system() result per entry, in manifest order, with
+        "project_name" and "query" added (or an "error" for that entry)
+    """
+    entries = []
+    folders = {}
+    for pos, entry in enumerate(manifest):
+        try:
+            entry = _manifest_entry(entry)
+        except ValueError as e:
+            raise ValueError(f"manifest entry {pos}: {e}") from None
+        # Entries sharing a design-system/<project>/ folder would overwrite each other
+        project_name = entry["project_name"] or entry["query"].upper()
+        folder = _project_slug(project_name)
+        if folder in folders:
+            raise ValueError(f"manifest entry {pos}: project {project_name!r} has the same folder "
+                             f"({folder}) as entry {folders[folder]}")
+        folders[folder] = pos
+        entries.append(entry)
+    output_dir = str(output_dir) if output_dir else os.getcwd()
+
+    # Build (and cache on disk) every index once here; workers then load the
+    # compiled, read-only indexes instead of re-indexing the CSVs
+    _batch_init()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entries)))
+    if workers == 1:
+        generated = [_generate_entry(entry, output_dir, cache) for entry in entries]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+        with ProcessPoolExecutor(workers, initializer=_batch_init) as pool:
+            chunksize = max(1, len(entries) // (workers * 4))
+            generated = list(pool.map(partial(_generate_entry, output_dir=output_dir, cache=cache), entries,
+                                      chunksize=chunksize))
+
+    persisted = iter(_flush_design_systems([plan for _, plan, _ in generated if plan is not None]))
+    results = []
+    for entry, (project_name, plan, error) in zip(entries, generated):
+        result = {"error": error} if plan is None else next(persisted)
+        result.update(project_name=project_name, query=entry["query"])
+        results.append(result)
+    return results
 
 
 # ============ PERSISTENCE FUNCTIONS ============
-def persist_design_system(design_system: dict, page: str = None, output_dir: str = None, page_query: str = None) -> dict:
+def _project_slug(project_name: str) -> str:
+    """Folder name of a project under design-system/."""
+    return project_name.lower().replace(' ', '-')
+
+
+def _content_digest(text: str) -> str:
+    """Hash of file content, ignoring the "Generated:" timestamp line."""
+    import hashlib
+    return hashlib.sha256(GENERATED_LINE.sub(r"\1", text).encode('utf-8')).hexdigest()
+
+
+def _write_if_changed(path: Path, content: str) -> bool:
+    """Atomically write content unless the file already holds it (timestamps aside); True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if _content_digest(f.read()) == _content_digest(content):
+                return False
+        mode = os.stat(path).st_mode & 0o7777
+    except (OSError, UnicodeDecodeError):
+        mode = None
+
+    # Write a sibling temp file and rename it over the target, so readers
+    # (and file watchers) only ever see the old or the complete new file
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+def _plan_design_system(design_system: dict, page=None, output_dir: str = None, page_query: str = None,
+                        cache: bool = None) -> tuple:
+    """Render the files of one project: (design_system_dir, {path: content})."""
+    base_dir = Path(output_dir) if output_dir else Path.cwd()
+
+    # Use project name for project-specific folder
+    project_name = design_system.get("project_name", "default")
+    design_system_dir = base_dir / "design-system" / _project_slug(project_name)
+
+    files = {design_system_dir / "MASTER.md": _render("master", design_system, cache=cache)}
+    # If pages are specified, add page override files with intelligent content
+    for page_name in ([page] if isinstance(page, str) else page or []):
+        page_file = design_system_dir / "pages" / f"{page_name.lower().replace(' ', '-')}.md"
+        files[page_file] = _render("page", design_system, page_name, page_query, cache=cache)
+    return design_system_dir, files
+
+
+def _flush_design_systems(plans: list) -> list:
+    """Write planned (design_system_dir, files) pairs in one pass; returns one persist result per plan.
+
+    A plan that would overwrite a file an earlier plan writes with different
+    content (two projects sharing a folder) is not written at all; its
+    result is an error naming the conflicting files.
+    """
+    contents = {}
+    owners = {}  # path -> digest of the content the first plan writing it planned
+    conflicts = {}
+    for pos, (design_system_dir, files) in enumerate(plans):
+        digests = {path: _content_digest(content) for path, content in files.items()}
+        clashes = [path for path in files if path in owners and owners[path] != digests[path]]
+        if clashes:
+            conflicts[pos] = clashes
+            continue
+        (design_system_dir / "pages").mkdir(parents=True, exist_ok=True)
+        for path, content in files.items():
+            if path not in owners:
+                owners[path] = digests[path]
+                contents[path] = content
+    written = {path: _write_if_changed(path, content) for path, content in contents.items()}
+
+    results = []
+    for pos, (design_system_dir, files) in enumerate(plans):
+        if pos in conflicts:
+            clashes = conflicts[pos]
+            results.append({
+                "status": "error",
+                "error": f"not written: an earlier project in this batch writes different content to "
+                         f"{', '.join(str(path) for path in clashes)}",
+                "design_system_dir": str(design_system_dir),
+                "conflicting_files": [str(path) for path in clashes]
+            })
+            continue
+        results.append({
+            "status": "success",
+            "design_system_dir": str(design_system_dir),
+            "created_files": [str(path) for path in files],
+            "changed_files": [str(path) for path in files if written[path]],
+            "unchanged_files": [str(path) for path in files if not written[path]]
+        })
+    return results
+
+
+def persist_design_system(design_system: dict, page: str = None, output_dir: str = None, page_query: str = None,
+                          cache: bool = None) -> dict:
     """
     Persist design system to design-system/<project>/ folder using Master + Overrides pattern.
+
+    Files whose content is unchanged (apart from the "Generated:" timestamp)
+    are left untouched; the others are replaced atomically.
     
     Args:
         design_system: The generated design system dictionary
-        page: Optional page name for page-specific override file
+        page: Optional page name (or list of page names) for page-specific override files
         output_dir: Optional output directory (defaults to current working directory)
         page_query: Optional query string for intelligent page override generation
+        cache: Use the on-disk design-system cache for the rendered files
     
     Returns:
-        dict with created file paths and status
+        dict with status, all file paths ("created_files") and which of them
+        were rewritten ("changed_files") or already up to date ("unchanged_files")
     """
-    base_dir = Path(output_dir) if output_dir else Path.cwd()
-    
-    # Use project name for project-specific folder
-    project_name = design_system.get("project_name", "default")
-    project_slug = project_name.lower().replace(' ', '-')
-    
-    design_system_dir = base_dir / "design-system" / project_slug
-    pages_dir = design_system_dir / "pages"
-    
-    created_files = []
-    
-    # Create directories
-    design_system_dir.mkdir(parents=True, exist_ok=True)
-    pages_dir.mkdir(parents=True, exist_ok=True)
-    
-    master_file = design_system_dir / "MASTER.md"
-    
-    # Generate and write MASTER.md
-    master_content = format_master_md(design_system)
-    with open(master_file, 'w', encoding='utf-8') as f:
-        f.write(master_content)
-    created_files.append(str(master_file))
-    
-    # If page is specified, create page override file with intelligent content
-    if page:
-        page_file = pages_dir / f"{page.lower().replace(' ', '-')}.md"
-        page_content = format_page_override_md(design_system, page, page_query)
-        with open(page_file, 'w', encoding='utf-8') as f:
-            f.write(page_content)
-        created_files.append(str(page_file))
-    
+    return _flush_design_systems([_plan_design_system(design_system, page, output_dir, page_query, cache)])[0]
+
+
+def persist_design_systems(projects: list, output_dir: str = None, cache: bool = None) -> dict:
+    """
+    Persist many design systems, rendering every file first and then writing them in one pass.
+
+    Args:
+        projects: Entries like {"design_system": ..., "pages": ["checkout"], "page_query": "SaaS dashboard"}
+                  (pages and page_query are optional)
+        output_dir: Optional output directory (defaults to current working directory)
+        cache: Use the on-disk design-system cache for the rendered files
+
+    Returns:
+        {"projects": one persist_design_system() result per entry (an "error" one, with nothing
+                      written, for a project whose files would overwrite an earlier project's),
+         "changed_files": [...], "unchanged_files": [...]} over all projects
+    """
+    plans = [_plan_design_system(project["design_system"], project.get("pages", project.get("page")), output_dir,
+                                 project.get("page_query"), cache) for project in projects]
+    results = _flush_design_systems(plans)
     return {
-        "status": "success",
-        "design_system_dir": str(design_system_dir),
-        "created_files": created_files
+        "projects": results,
+        "changed_files": sorted({path for result in results for path in result.get("changed_files", [])}),
+        "unchanged_files": sorted({path for result in results for path in result.get("unchanged_files", [])})
     }
 
 
@@ -918,16 +1251,13 @@ def _generate_intelligent_overrides(page_name: str, page_query: str, design_syst
     Uses the existing search infrastructure to find relevant style, UX, and layout
     data instead of hardcoded page types.
     """
-    from core import search
-    
     page_lower = page_name.lower()
     query_lower = (page_query or "").lower()
     combined_context = f"{page_lower} {query_lower}"
     
     # Search across multiple domains for page-specific guidance
-    style_search = search(combined_context, "style", max_results=1)
-    ux_search = search(combined_context, "ux", max_results=3)
-    landing_search = search(combined_context, "landing", max_results=1)
+    style_search, ux_search, landing_search = search_domains(
+        [(combined_context, "style", 1), (combined_context, "ux", 3), (combined_context, "landing", 1)])
     
     # Extract results from search response
     style_results = style_search.get("results", [])
@@ -1060,8 +1390,9 @@ if __name__ == "__main__":
     parser.add_argument("query", help="Search query (e.g., 'SaaS dashboard')")
     parser.add_argument("--project-name", "-p", type=str, default=None, help="Project name")
     parser.add_argument("--format", "-f", choices=["ascii", "markdown"], default="ascii", help="Output format")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the on-disk design-system cache")
 
     args = parser.parse_args()
 
-    result = generate_design_system(args.query, args.project_name, args.format)
+    result = generate_design_system(args.query, args.project_name, args.format, cache=False if args.no_cache else None)
     print(result)
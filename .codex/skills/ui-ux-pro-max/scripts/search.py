@@ -5,26 +5,56 @@ UI/UX Pro Max Search - BM25 search engine for UI/UX style guides
 Usage: python search.py "<query>" [--domain <domain>] [--stack <stack>] [--max-results 3]
        python search.py "<query>" --design-system [-p "Project Name"]
        python search.py "<query>" --design-system --persist [-p "Project Name"] [--page "dashboard"]
+       python search.py --design-system --batch manifest.json [--workers N] [-o DIR]
+       python search.py --ndjson [queries.ndjson] [--domain <domain>] [--stack <stack>]
+       python search.py "<query>" --explain-plan [--domain <domain>] [--stack <stack>]
 
 Domains: style, prompt, color, chart, landing, product, ux, typography
+         (omit --domain to route the query to the best-matching domain;
+         --domain all merges the best hits of every domain)
 Stacks: html-tailwind, react, nextjs
+        (--stack all, or a comma list such as swiftui,flutter, merges the best
+        hits of several stacks, each labelled with its stack)
 
 Persistence (Master + Overrides pattern):
   --persist    Save design system to design-system/MASTER.md
   --page       Also create a page-specific override file in design-system/pages/
+  --batch      Generate and persist many design systems from a JSON manifest, a list of
+               {"query": ..., "project_name": ..., "pages": [...]}, in worker processes
+               (--workers N, default: CPU count) that share the compiled indexes
+               Files whose content is unchanged are not rewritten
+  --no-cache   Regenerate even when the same design system (same query tokens, project
+               name and data files) is memoized in the on-disk design-system cache
+
+Server mode (warm indexes, JSON-RPC 2.0, one object per line):
+  --serve      Keep every index loaded and answer search/search_stack/generate_design_system
+               over a Unix socket (--socket PATH, default $UI_PRO_MAX_SOCKET or a per-user
+               temp path) or over stdin/stdout (--stdio). While a server is listening,
+               regular CLI calls are answered by it; --no-daemon always runs in-process.
+
+Batch mode (NDJSON):
+  --ndjson     Read one query per line from a file (or stdin when omitted / "-"),
+               either a JSON string or {"query": ..., "domain"/"stack"/"max_results"/"id": ...},
+               and stream one JSON result per line. All lines share the warm indexes.
+
+Query plans:
+  --explain-plan  Show the terms the query is scored with (merged repeats, dropped
+                  common or excess terms) and how many postings each one reads.
 """
 
 import argparse
+import os
 import sys
-import io
-from core import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, search, search_stack
-from design_system import generate_design_system, persist_design_system
+from core import CSV_CONFIG, AVAILABLE_STACKS, BACKENDS, MAX_RESULTS, search, search_stack
+
 
-# Force UTF-8 for stdout/stderr to handle emojis on Windows (cp1252 default)
-if sys.stdout.encoding and sys.stdout.encoding.lower() != 'utf-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-if sys.stderr.encoding and sys.stderr.encoding.lower() != 'utf-8':
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+def force_utf8_output():
+    """Force UTF-8 for stdout/stderr to handle emojis on Windows (cp1252 default)"""
+    import io
+    if sys.stdout.encoding and sys.stdout.encoding.lower() != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    if sys.stderr.encoding and sys.stderr.encoding.lower() != 'utf-8':
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 
 def format_output(result):
@@ -53,13 +83,137 @@ def format_output(result):
     return "\n".join(output)
 
 
+def format_plan(plans):
+    """Format query plans from explain_plan() as a text table per index"""
+    output = []
+    for plan in plans:
+        label = f"stack {plan['stack']}" if "stack" in plan else f"domain {plan['domain']}"
+        output.append(f"## Query plan: {label} ({plan['documents']} rows)")
+        output.append(f"{plan['tokens']} tokens -> {len(plan['terms'])} terms, {plan['postings']} postings")
+        output.append(f"{'term':<24} {'weight':>6} {'idf':>7} {'bound':>7} {'postings':>9}")
+        for term in plan["terms"]:
+            output.append(f"{term['term']:<24} {term['weight']:>6.3g} {term['idf']:>7.3f} "
+                          f"{term['max_impact']:>7.3f} {term['postings']:>9}")
+        for term in plan["dropped"]:
+            output.append(f"{term['term']:<24} dropped: {term['reason']}")
+        output.append("")
+    return "\n".join(output)
+
+
+def run(method, params, args):
+    """Run a request on the search server when one is listening, else in-process"""
+    from server import call, dispatch
+    if args.no_daemon:
+        return dispatch(method, params)
+    return call(method, params, args.socket)
+
+
+def stack_arg(value):
+    """argparse type for --stack: one stack, "all", or a comma-separated list"""
+    names = AVAILABLE_STACKS if value == "all" else [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in AVAILABLE_STACKS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(
+            f"invalid stack: {', '.join(unknown) or value!r} (choose from all, {', '.join(AVAILABLE_STACKS)})")
+    return value
+
+
+def request_error(request):
+    """Why an NDJSON request is unusable, or None when it is valid"""
+    if not isinstance(request, dict) or not isinstance(request.get("query"), str):
+        return 'Each line must be a JSON string or an object with a "query" field'
+    max_results = request.get("max_results", MAX_RESULTS)
+    if not isinstance(max_results, int) or isinstance(max_results, bool) or max_results < 0:
+        return '"max_results" must be a non-negative integer'
+    domain = request.get("domain")
+    if domain is not None and domain not in list(CSV_CONFIG) + ["all"]:
+        return f'"domain" must be one of {", ".join(list(CSV_CONFIG) + ["all"])}'
+    stack = request.get("stack")
+    if stack is not None:
+        if not isinstance(stack, str):
+            return '"stack" must be a string'
+        try:
+            stack_arg(stack)
+        except argparse.ArgumentTypeError as e:
+            return str(e)
+    return None
+
+
+def run_ndjson(stream, args):
+    """Answer NDJSON queries line by line, streaming one JSON result per line"""
+    import json
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            request, result = {}, {"error": f"Invalid JSON: {e}"}
+        else:
+            if isinstance(request, str):
+                request = {"query": request}
+            error = request_error(request)
+            if error is not None:
+                request, result = request if isinstance(request, dict) else {}, {"error": error}
+            else:
+                try:
+                    if request.get("stack", args.stack):
+                        result = search_stack(request["query"], request.get("stack", args.stack),
+                                              request.get("max_results", args.max_results), args.backend)
+                    else:
+                        result = search(request["query"], request.get("domain", args.domain),
+                                        request.get("max_results", args.max_results), args.backend)
+                except Exception as e:
+                    # One failing line must not end the stream
+                    result = {"error": f"{type(e).__name__}: {e}"}
+        if "id" in request:
+            result["id"] = request["id"]
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def load_manifest(path):
+    """Read a --batch manifest: a JSON list of projects, or {"projects": [...]}"""
+    import json
+
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest.get("projects")
+    if not isinstance(manifest, list):
+        raise ValueError('the manifest must be a JSON list of projects (or {"projects": [...]})')
+    return manifest
+
+
+def run_batch(manifest, args):
+    """Generate and persist every design system in a manifest; returns the exit status"""
+    import json
+    from design_system import generate_design_systems
+
+    results = generate_design_systems(manifest, args.output_dir or os.getcwd(), args.workers,
+                                      False if args.no_cache else None)
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for result in results:
+            if "error" in result:
+                print(f"❌ {result['project_name'] or result['query']}: {result['error']}")
+            else:
+                print(f"✅ {result['project_name']} -> {result['design_system_dir']} "
+                      f"({len(result['created_files'])} files, {len(result['changed_files'])} changed)")
+    return 1 if any("error" in result for result in results) else 0
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="UI Pro Max Search")
-    parser.add_argument("query", help="Search query")
-    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()), help="Search domain")
-    parser.add_argument("--stack", "-s", choices=AVAILABLE_STACKS, help="Stack-specific search (html-tailwind, react, nextjs)")
+    parser.add_argument("query", nargs="?", help="Search query")
+    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()) + ["all"], help="Search domain (all: merged hits across every domain)")
+    parser.add_argument("--stack", "-s", type=stack_arg, help="Stack-specific search (html-tailwind, react, nextjs; all or a comma list to compare stacks)")
     parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Scoring backend (numpy falls back to python when NumPy is not installed)")
+    parser.add_argument("--explain-plan", action="store_true", help="Show how the query is planned (terms, weights, dropped terms) instead of searching")
     # Design system generation
     parser.add_argument("--design-system", "-ds", action="store_true", help="Generate complete design system recommendation")
     parser.add_argument("--project-name", "-p", type=str, default=None, help="Project name for design system output")
@@ -68,19 +222,64 @@ if __name__ == "__main__":
     parser.add_argument("--persist", action="store_true", help="Save design system to design-system/MASTER.md (creates hierarchical structure)")
     parser.add_argument("--page", type=str, default=None, help="Create page-specific override file in design-system/pages/")
     parser.add_argument("--output-dir", "-o", type=str, default=None, help="Output directory for persisted files (default: current directory)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store memoized design systems")
+    # Batch mode
+    parser.add_argument("--ndjson", nargs="?", const="-", metavar="FILE", help="Stream NDJSON queries from FILE (default: stdin) and print one JSON result per line")
+    parser.add_argument("--batch", type=str, default=None, metavar="MANIFEST", help="With --design-system: generate and persist every project in a JSON manifest")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --batch (default: CPU count)")
+    # Server mode
+    parser.add_argument("--serve", action="store_true", help="Run a long-lived server with every index kept warm")
+    parser.add_argument("--stdio", action="store_true", help="With --serve: speak JSON-RPC over stdin/stdout instead of a Unix socket")
+    parser.add_argument("--socket", type=str, default=None, help="Unix socket path of the server (default: $UI_PRO_MAX_SOCKET or a per-user temp path)")
+    parser.add_argument("--no-daemon", action="store_true", help="Never use a running server; always search in-process")
 
     args = parser.parse_args()
+    force_utf8_output()
 
+    if args.serve:
+        from server import serve_stdio, serve_unix
+        if args.stdio:
+            serve_stdio()
+        else:
+            serve_unix(args.socket)
+    elif args.ndjson:
+        if args.ndjson == "-":
+            run_ndjson(sys.stdin, args)
+        else:
+            with open(args.ndjson, 'r', encoding='utf-8') as f:
+                run_ndjson(f, args)
+    elif args.batch:
+        if not args.design_system:
+            parser.error("--batch requires --design-system")
+        try:
+            manifest = load_manifest(args.batch)
+        except (OSError, ValueError) as e:
+            parser.error(f"--batch: {e}")
+        try:
+            status = run_batch(manifest, args)
+        except ValueError as e:
+            parser.error(f"--batch: {e}")
+        sys.exit(status)
+    elif args.query is None:
+        parser.error("the following arguments are required: query")
+    elif args.explain_plan:
+        plans = run("explain_plan", {"query": args.query, "domain": args.domain, "stack": args.stack}, args)
+        if args.json:
+            import json
+            print(json.dumps(plans, indent=2, ensure_ascii=False))
+        else:
+            print(format_plan(plans))
     # Design system takes priority
-    if args.design_system:
-        result = generate_design_system(
-            args.query, 
-            args.project_name, 
-            args.format,
-            persist=args.persist,
-            page=args.page,
-            output_dir=args.output_dir
-        )
+    elif args.design_system:
+        result = run("generate_design_system", {
+            "query": args.query,
+            "project_name": args.project_name,
+            "output_format": args.format,
+            "persist": args.persist,
+            "page": args.page,
+            "output_dir": args.output_dir or os.getcwd(),
+            "cache": False if args.no_cache else None
+        }, args)
         print(result)
         
         # Print persistence confirmation
@@ -98,7 +297,8 @@ if __name__ == "__main__":
             print("=" * 60)
     # Stack search
     elif args.stack:
-        result = search_stack(args.query, args.stack, args.max_results)
+        result = run("search_stack", {"query": args.query, "stack": args.stack,
+                                      "max_results": args.max_results, "backend": args.backend}, args)
         if args.json:
             import json
             print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -106,7 +306,8 @@ if __name__ == "__main__":
             print(format_output(result))
     # Domain search
     else:
-        result = search(args.query, args.domain, args.max_results)
+        result = run("search", {"query": args.query, "domain": args.domain,
+                                "max_results": args.max_results, "backend": args.backend}, args)
         if args.json:
             import json
             print(json.dumps(result, indent=2, ensure_ascii=False))
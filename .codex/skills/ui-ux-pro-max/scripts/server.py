@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Server - keeps every domain and stack index warm and answers
+JSON-RPC 2.0 requests (one JSON object per line) over a Unix socket or stdio.
+
+Usage:
+    python search.py --serve                    # Unix socket (default path below)
+    python search.py --serve --socket /tmp/uipro.sock
+    python search.py --serve --stdio            # JSON-RPC over stdin/stdout
+
+    from server import call
+    result = call("search", {"query": "glassmorphism", "domain": "style"})
+
+Methods: search, search_stack, search_many, detect_domains, explain_plan,
+generate_design_system, reload, refresh, cache_stats, ping.
+Edits to the data CSVs are picked up on the next request that touches them:
+changed rows are applied to the loaded index in place (see
+CorpusRegistry.refresh), so the server never pauses for a full rebuild.
+call() uses a running daemon when one is listening and otherwise runs the
+method in-process, so callers never need to know whether a daemon exists.
+json/socket are imported only when actually talking to a server, so the
+in-process fallback adds nothing to CLI startup.
+"""
+
+import os
+import sys
+
+from core import (AVAILABLE_STACKS, CSV_CONFIG, MAX_RESULTS, cache_stats, detect_domains, explain_plan, registry, search,
+                  search_many, search_stack)
+
+# ============ CONFIGURATION ============
+SOCKET_ENV = "UI_PRO_MAX_SOCKET"
+CLIENT_TIMEOUT = 60
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    """Error returned by a JSON-RPC method"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def default_socket_path():
+    """Socket path from UI_PRO_MAX_SOCKET, else a per-user path in XDG_RUNTIME_DIR or the temp dir"""
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "ui-ux-pro-max.sock")
+    # Avoid importing tempfile (shutil, random, ...) on the CLI fast path
+    tmp_dir = os.environ.get("TMPDIR") or os.environ.get("TEMP") or os.environ.get("TMP")
+    if not tmp_dir:
+        if os.name == "posix":
+            tmp_dir = "/tmp"
+        else:
+            import tempfile
+            tmp_dir = tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tmp_dir, f"ui-ux-pro-max-{uid}.sock")
+
+
+# ============ METHODS ============
+def _search(query, domain=None, max_results=MAX_RESULTS, backend=None):
+    return search(query, domain, max_results, backend)
+
+
+def _search_stack(query, stack, max_results=MAX_RESULTS, backend=None):
+    return search_stack(query, stack, max_results, backend)
+
+
+def _search_many(queries, domain=None, stack=None, max_results=MAX_RESULTS, backend=None):
+    return search_many(queries, domain, stack, max_results, backend)
+
+
+def _detect_domains(query):
+    return [[domain, confidence] for domain, confidence in detect_domains(query)]
+
+
+def _explain_plan(query, domain=None, stack=None):
+    return explain_plan(query, domain, stack)
+
+
+def _generate_design_system(query, project_name=None, output_format="ascii", persist=False, page=None, output_dir=None,
+                            cache=None):
+    from design_system import generate_design_system
+    return generate_design_system(query, project_name, output_format, persist=persist, page=page, output_dir=output_dir,
+                                  cache=cache)
+
+
+def _reload():
+    registry.reload()
+    return "ok"
+
+
+def _refresh():
+    return {f"{kind}:{name}": {"added": added, "changed": changed, "removed": removed}
+            for (kind, name), (added, changed, removed) in registry.refresh().items()}
+
+
+def _ping():
+    return "pong"
+
+
+METHODS = {
+    "search": _search,
+    "search_stack": _search_stack,
+    "search_many": _search_many,
+    "detect_domains": _detect_domains,
+    "explain_plan": _explain_plan,
+    "generate_design_system": _generate_design_system,
+    "reload": _reload,
+    "refresh": _refresh,
+    "cache_stats": cache_stats,
+    "ping": _ping
+}
+
+
+def dispatch(method, params=None):
+    """Run a method in this process"""
+    func = METHODS.get(method)
+    if func is None:
+        raise RPCError(METHOD_NOT_FOUND, f"Method not found: {method}")
+    params = params or {}
+    args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+    try:
+        return func(*args, **kwargs)
+    except TypeError as e:
+        # Raised while binding the arguments, not from inside the method
+        if e.__traceback__.tb_next is None:
+            raise RPCError(INVALID_PARAMS, f"Invalid params for {method}: {e}")
+        raise
+
+
+def handle_line(line):
+    """Answer one JSON-RPC request line; returns the response line, or None for notifications"""
+    import json
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return _response(None, error=(PARSE_ERROR, f"Parse error: {e}"))
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return _response(request.get("id") if isinstance(request, dict) else None,
+                         error=(INVALID_REQUEST, "Invalid request"))
+
+    request_id = request.get("id")
+    try:
+        result = dispatch(request["method"], request.get("params"))
+    except RPCError as e:
+        response = _response(request_id, error=(e.code, str(e)))
+    except Exception as e:
+        response = _response(request_id, error=(INTERNAL_ERROR, f"{type(e).__name__}: {e}"))
+    else:
+        response = _response(request_id, result=result)
+    return response if "id" in request else None
+
+
+def _response(request_id, result=None, error=None):
+    import json
+    response = {"jsonrpc": "2.0", "id": request_id}
+    if error:
+        response["error"] = {"code": error[0], "message": error[1]}
+    else:
+        response["result"] = result
+    return json.dumps(response, ensure_ascii=False)
+
+
+# ============ SERVER ============
+def warm_up():
+    """Load every domain, stack and the reasoning table into the registry"""
+    from design_system import REASONING_FILE
+    registry.auto_refresh = True
+    for domain in CSV_CONFIG:
+        registry.get(domain)
+    for stack in AVAILABLE_STACKS:
+        registry.get_stack(stack)
+    registry.table(REASONING_FILE)
+
+
+def serve_stdio(stdin=None, stdout=None):
+    """Answer JSON-RPC lines from stdin until EOF"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    warm_up()
+    for line in stdin:
+        if not line.strip():
+            continue
+        response = handle_line(line)
+        if response is not None:
+            stdout.write(response + "\n")
+            stdout.flush()
+
+
+def serve_unix(path=None):
+    """Answer JSON-RPC lines on a Unix domain socket until interrupted"""
+    import signal
+    import socket
+    import socketserver
+    import threading
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix domain sockets are not supported on this platform; use --stdio")
+    path = path or default_socket_path()
+    if os.path.exists(path):
+        if _is_listening(path):
+            raise RuntimeError(f"A server is already listening on {path}")
+        os.unlink(path)  # stale socket from a previous run
+
+    # Requests may update indexes in place (auto-refresh), so connections
+    # share the registry one request at a time
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                with lock:
+                    response = handle_line(line.decode("utf-8"))
+                if response is not None:
+                    self.wfile.write(response.encode("utf-8") + b"\n")
+                    self.wfile.flush()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    warm_up()
+    # Created owner-only: a chmod after bind would leave a window where
+    # other users can connect
+    old_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    finally:
+        os.umask(old_umask)
+    server.daemon_threads = True
+    print(f"UI Pro Max server listening on {path}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _is_listening(path):
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+# ============ CLIENT ============
+def call(method, params=None, socket_path=None):
+    """Run a method on the daemon if one is listening, otherwise in-process"""
+    path = socket_path or default_socket_path()
+    if _is_own_socket(path):
+        try:
+            response = _remote_call(path, method, params or {})
+        except (OSError, ValueError, AttributeError):
+            pass  # no live daemon (or it went away mid-call): fall back to in-process
+        else:
+            if "error" in response:
+                raise RPCError(response["error"].get("code", INTERNAL_ERROR), response["error"].get("message", ""))
+            return response.get("result")
+    return dispatch(method, params)
+
+
+def _is_own_socket(path):
+    """Whether path is a socket owned by the current user - another user's
+    socket at a predictable path is never trusted with a request"""
+    import stat
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(st.st_mode):
+        return False
+    return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+
+def _remote_call(path, method, params):
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CLIENT_TIMEOUT)
+        sock.connect(path)
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ValueError("Empty response from server")
+    return json.loads(line)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Tokenizer - text normalization shared by indexing and search
+
+Lowercases, splits on anything that is not a word character and drops
+tokens of 2 characters or fewer. Two optional steps, both off by default
+and applied identically to documents and queries:
+
+    UI_PRO_MAX_STEM=1        light S-stemming ("animations" -> "animation")
+    UI_PRO_MAX_STOPWORDS=1   drop common English function words
+
+Usage:
+    from tokenizer import tokenize, tokenize_query, configure
+    configure(stem=True)
+    python tokenizer.py --bench      # tokens/sec over the bundled data files
+"""
+
+import os
+import re
+import sys
+from functools import lru_cache
+
+# ============ CONFIGURATION ============
+MIN_LENGTH = 3
+QUERY_CACHE_SIZE = 4096
+VOCABULARY_SIZE = 1 << 20  # raw -> normalized token memo, cleared when full
+
+# Words longer than 2 characters that carry no search signal
+STOPWORDS = frozenset("""
+about after all also and any are been before being both but can could did does doing each for from had has
+have how into its just may might more most must not only onto other our over per should some such than that
+the their them then there these they this those under very via was were what when where which who whom why
+will with would you your
+""".split())
+
+# Runs of word characters: the same tokens as replacing [^\w\s] with spaces and splitting
+_TOKEN = re.compile(r"\w{%d,}" % MIN_LENGTH)
+
+_settings = {
+    "stem": bool(os.environ.get("UI_PRO_MAX_STEM")),
+    "stopwords": bool(os.environ.get("UI_PRO_MAX_STOPWORDS"))
+}
+
+
+# ============ NORMALIZATION ============
+def s_stem(word):
+    """Harman's S-stemmer: strip plural endings only (ies -> y, es -> e, s -> '')"""
+    if word.endswith("ies") and not word.endswith(("eies", "aies")):
+        return word[:-3] + "y"
+    if word.endswith("es") and not word.endswith(("aes", "ees", "oes")):
+        return word[:-1]
+    if word.endswith("s") and not word.endswith(("us", "ss")):
+        return word[:-1]
+    return word
+
+
+class _Vocabulary(dict):
+    """Memo of raw token -> normalized, interned token ("" for a stopword)
+
+    One C-level dict lookup per token replaces stemming, stopword checks and
+    sys.intern() for every token seen before.
+    """
+
+    def __missing__(self, token):
+        if len(self) >= VOCABULARY_SIZE:
+            self.clear()
+        word = token
+        if _settings["stopwords"] and word in STOPWORDS:
+            word = ""
+        elif _settings["stem"]:
+            word = s_stem(word)
+        word = self[token] = sys.intern(word)
+        return word
+
+
+_vocabulary = _Vocabulary()
+
+
+def configure(stem=None, stopwords=None):
+    """Turn stemming / stopword removal on or off (None leaves a setting unchanged)
+
+    Indexes loaded by core.registry remember the config() they were built
+    with and are rebuilt on their next use; the index and result caches are
+    keyed by config(), so entries made under other options are never reused.
+    """
+    if stem is not None:
+        _settings["stem"] = bool(stem)
+    if stopwords is not None:
+        _settings["stopwords"] = bool(stopwords)
+    _vocabulary.clear()
+    tokenize_query.cache_clear()
+
+
+def config():
+    """Active options as a tuple, for cache keys (empty with the defaults)"""
+    return tuple(name for name in ("stem", "stopwords") if _settings[name])
+
+
+def tokenize(text):
+    """Tokens of a document, in order, with repeats (interned)"""
+    tokens = list(map(_vocabulary.__getitem__, _TOKEN.findall(str(text).lower())))
+    if _settings["stopwords"]:
+        return [token for token in tokens if token]
+    return tokens
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def tokenize_query(text):
+    """tokenize() for queries, memoized; returns a tuple so callers cannot alter the cache"""
+    return tuple(tokenize(text))
+
+
+# ============ BENCHMARK ============
+def _legacy_tokenize(text):
+    """The original BM25.tokenize, for comparison"""
+    text = re.sub(r'[^\w\s]', ' ', str(text).lower())
+    return [w for w in text.split() if len(w) > 2]
+
+
+def bench(repeat=5):
+    """Print tokens/sec for each tokenizer setting over every bundled data CSV"""
+    import csv
+    import time
+    from pathlib import Path
+
+    data_dir = Path(__file__).parent.parent / "data"
+    texts = []
+    for path in sorted(data_dir.glob("**/*.csv")):
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.extend(" ".join(str(value) for value in row.values()) for row in csv.DictReader(f))
+
+    saved = dict(_settings)
+    cases = [("legacy re.sub + split", _legacy_tokenize, None)]
+    for stem, stopwords in ((False, False), (True, False), (False, True), (True, True)):
+        label = "tokenize" + "".join(f" +{name}" for name, on in (("stem", stem), ("stopwords", stopwords)) if on)
+        cases.append((label, tokenize, (stem, stopwords)))
+
+    print(f"{len(texts)} documents, best of {repeat} runs")
+    try:
+        for label, func, settings in cases:
+            if settings:
+                configure(*settings)
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                count = sum(len(func(text)) for text in texts)
+                best = min(best, time.perf_counter() - start)
+            print(f"{label:<32} {count / best / 1e6:>7.2f} M tokens/s  ({count} tokens)")
+    finally:
+        configure(saved["stem"], saved["stopwords"])
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="UI Pro Max tokenizer")
+    parser.add_argument("text", nargs="?", help="Text to tokenize")
+    parser.add_argument("--bench", action="store_true", help="Measure tokens/sec over the bundled data files")
+    args = parser.parse_args()
+    if args.bench:
+        bench()
+    elif args.text is not None:
+        print(tokenize(args.text))
+    else:
+        parser.error("give some text or --bench")